@@ -0,0 +1,106 @@
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.utils.encoding import filepath_to_uri
+from django.utils.translation import gettext as _
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+from rest_framework.relations import MANY_RELATION_KWARGS
+
+MEDIA_URL_CONTEXT_KEY = 'media_url'
+
+
+def resolve_primary_keys(queryset, pks):
+    """
+    Objects for the submitted primary keys fetched with one IN query,
+    in the submitted order. Malformed and unknown keys
+    are reported together
+    """
+    pk_field = queryset.model._meta.pk
+    values, invalid = [], []
+    for pk in pks:
+        try:
+            value = pk_field.to_python(pk)
+        except (DjangoValidationError, TypeError):
+            value = None
+        if value is None:
+            invalid.append(pk)
+        else:
+            values.append(value)
+
+    objects = queryset.in_bulk(set(values))
+    missing = list(dict.fromkeys(
+        str(value) for value in values if value not in objects
+    ))
+    errors = []
+    if invalid:
+        errors.append(
+            _('Incorrect type. Expected pk value: ')
+            + ', '.join(repr(pk) for pk in invalid)
+        )
+    if missing:
+        errors.append(
+            _('Objects do not exist: ') + ', '.join(missing)
+        )
+    if errors:
+        raise ValidationError(errors)
+    return [objects[value] for value in values]
+
+
+class BulkManyRelatedField(serializers.ManyRelatedField):
+    """
+    Many related field resolving the whole list with one query,
+    repeated keys are merged
+    """
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail('empty')
+        return list(dict.fromkeys(resolve_primary_keys(
+            self.child_relation.get_queryset(), data
+        )))
+
+
+class BulkPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    Primary key related field, with many=True
+    all keys are resolved at once
+    """
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {'child_relation': cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+        return BulkManyRelatedField(**list_kwargs)
+
+
+class MediaURLField(serializers.Field):
+    """
+    Read-only URL of a stored file built from its name.
+    The absolute media prefix is resolved once per serializer context,
+    neither the storage nor the file is touched
+    """
+
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def get_media_url(self):
+        context = self.context
+        media_url = context.get(MEDIA_URL_CONTEXT_KEY)
+        if media_url is None:
+            request = context.get('request')
+            media_url = (
+                settings.MEDIA_URL if request is None
+                else request.build_absolute_uri(settings.MEDIA_URL)
+            )
+            context[MEDIA_URL_CONTEXT_KEY] = media_url
+        return media_url
+
+    def to_representation(self, value):
+        if not value:
+            return None
+        return self.get_media_url() + filepath_to_uri(value.name)
@@ -1,7 +1,16 @@
+from django.db.models import (
+    Case, Exists, IntegerField, OuterRef, Value, When
+)
 from django_filters.rest_framework import FilterSet, filters
 
 from recipes.models import Ingredient, Recipe, Tag
 
+# ?ordering values, each one follows a Recipe index
+RECIPE_ORDERINGS = {
+    'popular': ('-favorites_count', '-pub_date', 'name'),
+    'trending': ('-trending_score', '-pub_date', 'name'),
+}
+
 
 class RecipeFilter(FilterSet):
     is_favorited = filters.BooleanFilter(method='is_favorited_filter')
@@ -12,13 +21,40 @@ class RecipeFilter(FilterSet):
         field_name='tags__slug',
         to_field_name='slug',
         queryset=Tag.objects.all(),
+        method='tags_filter',
     )
     author = filters.NumberFilter(field_name='author__id')
+    ordering = filters.ChoiceFilter(
+        choices=[(ordering, ordering) for ordering in RECIPE_ORDERINGS],
+        method='ordering_filter',
+    )
 
     class Meta:
         model = Recipe
         fields = ('tags', 'author',)
 
+    def tags_filter(self, queryset, name, value):
+        """
+        Recipes with any of the tags as a semi-join,
+        so a recipe with several matching tags is returned once
+        without DISTINCT
+        """
+        if not value:
+            return queryset
+        return queryset.filter(Exists(
+            Recipe.tags.through.objects.filter(
+                recipe=OuterRef('pk'), tag__in=value
+            )
+        ))
+
+    def ordering_filter(self, queryset, name, value):
+        """
+        Sort by the precomputed score columns, never by aggregates
+        """
+        if not value:
+            return queryset
+        return queryset.order_by(*RECIPE_ORDERINGS[value])
+
     def is_favorited_filter(self, queryset, name, value):
         return (
             queryset.filter(favorite__user=self.request.user)
@@ -35,8 +71,22 @@ class RecipeFilter(FilterSet):
 
 
 class IngredientFilter(FilterSet):
-    name = filters.CharFilter(field_name='name', lookup_expr='icontains')
+    name = filters.CharFilter(method='name_filter')
 
     class Meta:
         model = Ingredient
         fields = ('name',)
+
+    def name_filter(self, queryset, name, value):
+        """
+        Substring search served by the pg_trgm index,
+        names starting with the value go first
+        """
+        return queryset.filter(name__icontains=value).order_by(
+            Case(
+                When(name__istartswith=value, then=Value(0)),
+                default=Value(1),
+                output_field=IntegerField(),
+            ),
+            'name'
+        )
@@ -0,0 +1,95 @@
+from hashlib import md5
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import (
+    get_conditional_response, patch_cache_control, patch_vary_headers
+)
+from django.utils.http import quote_etag, urlencode
+from rest_framework import status
+
+from core.cache import get_catalogue_version
+
+
+class CatalogueCacheMixin:
+    """
+    Conditional GET and server-side caching of rendered catalogue
+    responses, keyed by the catalogue version stamp
+    """
+    catalogue = None
+
+    def get_catalogue_params(self):
+        """
+        Query parameters recognised by the filterset, in name order,
+        so unknown parameters do not create new cache entries
+        """
+        filterset_class = getattr(self, 'filterset_class', None)
+        names = filterset_class.base_filters if filterset_class else ()
+        params = self.request.query_params
+        return sorted(
+            (name, params[name]) for name in names if name in params
+        )
+
+    def get_catalogue_cache_key(self):
+        request = self.request
+        self.catalogue_version = get_catalogue_version(self.catalogue)
+        return 'catalogue:{}:{}:{}:{}?{}'.format(
+            self.catalogue,
+            self.catalogue_version,
+            request.accepted_media_type,
+            request.path,
+            urlencode(self.get_catalogue_params()),
+        )
+
+    def cached_response(self, view, request, *args, **kwargs):
+        self.catalogue_cache_key = self.get_catalogue_cache_key()
+        self.catalogue_etag = quote_etag(
+            md5(self.catalogue_cache_key.encode()).hexdigest()
+        )
+        response = get_conditional_response(
+            request, etag=self.catalogue_etag
+        )
+        if response is not None:
+            return response
+
+        cached = cache.get(self.catalogue_cache_key)
+        if cached is None:
+            return view(request, *args, **kwargs)
+        content, content_type = cached
+        self.catalogue_cache_key = None
+        return HttpResponse(content, content_type=content_type)
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            super().retrieve, request, *args, **kwargs
+        )
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(
+            request, response, *args, **kwargs
+        )
+        if getattr(self, 'catalogue_etag', None) is None:
+            return response
+        if response.status_code not in (
+            status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED
+        ):
+            return response
+
+        if self.catalogue_cache_key is not None and (
+            response.status_code == status.HTTP_200_OK
+        ):
+            response.render()
+            cache.set(
+                self.catalogue_cache_key,
+                (response.content, response['Content-Type'])
+            )
+        response['ETag'] = self.catalogue_etag
+        patch_vary_headers(response, ('Accept',))
+        patch_cache_control(
+            response, public=True, max_age=settings.CATALOGUE_CACHE_MAX_AGE
+        )
+        return response
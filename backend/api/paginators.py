@@ -1,5 +1,106 @@
-from rest_framework.pagination import PageNumberPagination
+from datetime import datetime
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+from django.utils.translation import gettext as _
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import (
+    Cursor, CursorPagination, PageNumberPagination
+)
+
+from api.filters import RECIPE_ORDERINGS
+from recipes.models import FeedEntry
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator taking the count of unfiltered querysets
+    from PostgreSQL table statistics instead of COUNT(*)
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        if connection.vendor == 'postgresql' and not queryset.query.where:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT reltuples FROM pg_class WHERE oid = %s::regclass',
+                    [queryset.model._meta.db_table]
+                )
+                estimate = int(cursor.fetchone()[0])
+            if estimate >= settings.COUNT_ESTIMATE_THRESHOLD:
+                return estimate
+        return super().count
 
 
 class PageNumberLimitPagination(PageNumberPagination):
     page_size_query_param = 'limit'
+
+
+class EstimatedPageNumberLimitPagination(PageNumberLimitPagination):
+    django_paginator_class = EstimatedCountPaginator
+
+
+class RecipeCursorPagination(CursorPagination):
+    """
+    Keyset pagination following Recipe.Meta.ordering
+    """
+    page_size_query_param = 'limit'
+    ordering = ('-pub_date', 'name', 'id')
+
+    def get_ordering(self, request, queryset, view):
+        """
+        The cursor keeps only the first ordering column, recipes tied
+        on a score would be repeated, so ?ordering is paged by number
+        """
+        if request.query_params.get('ordering') in RECIPE_ORDERINGS:
+            raise ValidationError({'pagination': _(
+                'Cursor pagination is not available for this ordering'
+            )})
+        return self.ordering
+
+
+class FeedCursorPagination(CursorPagination):
+    """
+    Keyset pagination of FeedEntry.objects.page(),
+    the cursor holds the key of the last recipe shown.
+    The feed is only read forwards
+    """
+    page_size_query_param = 'limit'
+
+    def paginate_feed(self, request, user):
+        """
+        Recipe ids of the requested feed page
+        """
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        cursor = self.decode_cursor(request)
+        before = None if cursor is None else self.decode_key(cursor.position)
+
+        keys = FeedEntry.objects.page(user, self.page_size + 1, before)
+        self.has_next = len(keys) > self.page_size
+        keys = keys[:self.page_size]
+        self.next_key = keys[-1] if keys else None
+        return [recipe_id for _, recipe_id in keys]
+
+    def decode_key(self, position):
+        try:
+            pub_date, recipe_id = position.split('|')
+            return datetime.fromisoformat(pub_date), int(recipe_id)
+        except (AttributeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        pub_date, recipe_id = self.next_key
+        position = f'{pub_date.isoformat()}|{recipe_id}'
+        return self.encode_cursor(
+            Cursor(offset=0, reverse=False, position=position)
+        )
+
+    def get_previous_link(self):
+        return None
@@ -1,17 +1,23 @@
 from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Prefetch, prefetch_related_objects
 from django.utils.translation import gettext as _
 from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
 from rest_framework.validators import UniqueTogetherValidator
 
+from api.fields import (
+    BulkPrimaryKeyRelatedField, MediaURLField, resolve_primary_keys
+)
 from api.users.serializers import CustomUserSerializer
 from foodgram import settings
-from foodgram.settings import AMOUNT_MIN_VALUE, MIN_TIME_VALUE
+from foodgram.settings import MIN_TIME_VALUE
 from recipes.models import (
     Favorite, Ingredient, Recipe,
-    RecipeIngredient, ShoppingCart, Tag
+    RecipeIngredient, ShoppingCart, ShoppingCartExport, Tag
 )
+from recipes.signals import bump_recipe_shopping_carts
 
 User = get_user_model()
 
@@ -39,15 +45,30 @@ class IngredientSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'measurement_unit')
 
 
+class RecipeIngredientListSerializer(serializers.ListSerializer):
+    """
+    Resolve the ingredients of the whole list with one query
+    """
+
+    def to_internal_value(self, data):
+        ingredients_data = super().to_internal_value(data)
+        ingredients = resolve_primary_keys(
+            Ingredient.objects.all(),
+            [item['ingredient']['id'] for item in ingredients_data]
+        )
+        if len(set(ingredients)) != len(ingredients):
+            raise ValidationError(_('The ingredients must be unique'))
+        for item, ingredient in zip(ingredients_data, ingredients):
+            item['ingredient']['id'] = ingredient
+        return ingredients_data
+
+
 class RecipeIngredientSerializer(serializers.ModelSerializer):
     """
     Serialize ingredients in recipe
     """
-    # id from ingredient
-    id = serializers.PrimaryKeyRelatedField(
-        queryset=Ingredient.objects.all(),
-        source='ingredient.id'
-    )
+    # id from ingredient, resolved by RecipeIngredientListSerializer
+    id = serializers.IntegerField(source='ingredient.id')
     # name from ingredient
     name = serializers.ReadOnlyField(source='ingredient.name')
     # measurement unit from ingredient
@@ -59,6 +80,7 @@ class RecipeIngredientSerializer(serializers.ModelSerializer):
     class Meta:
         model = RecipeIngredient
         fields = ('id', 'name', 'measurement_unit', 'amount')
+        list_serializer_class = RecipeIngredientListSerializer
 
 
 class RecipeSerializer(serializers.ModelSerializer):
@@ -80,12 +102,6 @@ class RecipeSerializer(serializers.ModelSerializer):
             'ingredients', 'name', 'image',
             'text', 'cooking_time'
         )
-        validators = [
-            UniqueTogetherValidator(
-                queryset=Recipe.objects.all(),
-                fields=['author', 'name', 'text']
-            )
-        ]
 
 
 class RecipeReadSerializer(RecipeSerializer):
@@ -94,31 +110,47 @@ class RecipeReadSerializer(RecipeSerializer):
     """
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
-    image = serializers.ReadOnlyField(source='image.url')
+    image = MediaURLField(source='preview_image')
 
     class Meta(RecipeSerializer.Meta):
         fields = (RecipeSerializer.Meta.fields
                   + ('is_favorited', 'is_in_shopping_cart')
                   )
 
-    def favorite_shopping_cart_fields(self, class_obj, obj):
+    def favorite_shopping_cart_fields(self, class_obj, obj, annotation):
+        # annotated by Recipe.objects.with_user_flags
+        if hasattr(obj, annotation):
+            return getattr(obj, annotation)
         request = self.context.get('request')
-        user = request.user
-        if request and user.is_authenticated:
-            return class_obj.objects.filter(recipe=obj, user=user).exists()
+        if request and request.user.is_authenticated:
+            return class_obj.objects.filter(
+                recipe=obj, user=request.user
+            ).exists()
+        return False
 
     def get_is_favorited(self, obj):
-        return self.favorite_shopping_cart_fields(Favorite, obj)
+        return self.favorite_shopping_cart_fields(
+            Favorite, obj, 'is_favorited'
+        )
 
     def get_is_in_shopping_cart(self, obj):
-        return self.favorite_shopping_cart_fields(ShoppingCart, obj)
+        return self.favorite_shopping_cart_fields(
+            ShoppingCart, obj, 'is_in_shopping_cart'
+        )
+
+
+class RecipeDetailSerializer(RecipeReadSerializer):
+    """
+    Recipe page serializer, shows the full size image
+    """
+    image = MediaURLField(source='display_image')
 
 
 class RecipeWriteSerializer(RecipeSerializer):
     """
     Recipe create/update/destroy serializer
     """
-    tags = serializers.PrimaryKeyRelatedField(
+    tags = BulkPrimaryKeyRelatedField(
         queryset=Tag.objects.all(),
         many=True
     )
@@ -131,37 +163,49 @@ class RecipeWriteSerializer(RecipeSerializer):
             raise ValidationError(
                 _('Impossible to create a recipe')
             )
-        # validate ingredients
-        ingredients_amount = attrs['recipe_ingredient']
-        if not ingredients_amount:
+        # amounts and uniqueness are checked by the ingredients field,
+        # a partial update may leave the ingredients out
+        if (
+            not self.partial or 'recipe_ingredient' in attrs
+        ) and not attrs.get('recipe_ingredient'):
             raise ValidationError(
                 _('The list of ingredients cannot be empty')
             )
-        unique_ingredients = set()
-        for data in ingredients_amount:
-            if data['amount'] < AMOUNT_MIN_VALUE:
-                raise ValidationError(
-                    _('The amount must be greater than or equal to ',
-                      AMOUNT_MIN_VALUE
-                      )
-                )
-            ingredient = data['ingredient']['id']
-            if ingredient in unique_ingredients:
-                raise ValidationError(
-                    _('The ingredients must be unique')
-                )
-            unique_ingredients.add(ingredient)
 
         # validate cooking time
-        if attrs['cooking_time'] < MIN_TIME_VALUE:
+        if attrs.get('cooking_time', MIN_TIME_VALUE) < MIN_TIME_VALUE:
             raise ValidationError(
                 _('The amount must be greater than or equal to ',
                   MIN_TIME_VALUE
                   )
             )
 
+        self.validate_unique_text(attrs)
         return attrs
 
+    def validate_unique_text(self, attrs):
+        """
+        Unique author, name and text, the text is compared by its hash
+        """
+        instance = self.instance
+        name = attrs.get('name', getattr(instance, 'name', None))
+        text = attrs.get('text', getattr(instance, 'text', None))
+        if instance is not None and (name, text) == (
+            instance.name, instance.text
+        ):
+            return
+        recipes = Recipe.objects.filter(
+            author=attrs.get('author', getattr(instance, 'author', None)),
+            name=name,
+            text_hash=Recipe.get_text_hash(text),
+        )
+        if instance is not None:
+            recipes = recipes.exclude(pk=instance.pk)
+        if recipes.exists():
+            raise ValidationError(
+                _('The recipe with this name and text already exists')
+            )
+
     def add_ingredients(self, recipe, ingredients_data):
         ingredients_list = []
         for data in ingredients_data:
@@ -178,6 +222,7 @@ class RecipeWriteSerializer(RecipeSerializer):
             ingredients_list
         )
 
+    @transaction.atomic
     def create(self, validated_data):
         ingredients_data = validated_data.pop('recipe_ingredient')
         tags_data = validated_data.pop('tags')
@@ -185,20 +230,91 @@ class RecipeWriteSerializer(RecipeSerializer):
 
         self.add_ingredients(recipe, ingredients_data)
 
-        recipe.tags.set(tags_data)
-        recipe.save()
+        # the recipe is new, no need to check for existing tags
+        Recipe.tags.through.objects.bulk_create(
+            Recipe.tags.through(recipe=recipe, tag=tag) for tag in tags_data
+        )
         return recipe
 
+    def to_representation(self, instance):
+        prefetch_related_objects(
+            [instance],
+            'tags',
+            Prefetch(
+                'recipe_ingredient',
+                queryset=RecipeIngredient.objects.select_related('ingredient')
+            ),
+        )
+        return super().to_representation(instance)
+
+    def update_ingredients(self, recipe, ingredients_data):
+        """
+        Apply only the difference between the submitted and stored
+        ingredient amounts, returns whether anything changed
+        """
+        stored = {
+            recipe_ingredient.ingredient_id: recipe_ingredient
+            for recipe_ingredient in recipe.recipe_ingredient.all()
+        }
+        submitted = {
+            data['ingredient']['id'].pk: data.get('amount')
+            for data in ingredients_data
+        }
+        created = [
+            RecipeIngredient(
+                recipe=recipe, ingredient_id=ingredient_id, amount=amount
+            )
+            for ingredient_id, amount in submitted.items()
+            if ingredient_id not in stored
+        ]
+        changed = []
+        for ingredient_id, amount in submitted.items():
+            recipe_ingredient = stored.get(ingredient_id)
+            if recipe_ingredient and recipe_ingredient.amount != amount:
+                recipe_ingredient.amount = amount
+                changed.append(recipe_ingredient)
+        deleted = [
+            recipe_ingredient.pk
+            for ingredient_id, recipe_ingredient in stored.items()
+            if ingredient_id not in submitted
+        ]
+
+        if deleted:
+            RecipeIngredient.objects.filter(pk__in=deleted).delete()
+        if changed:
+            RecipeIngredient.objects.bulk_update(changed, ('amount',))
+        if created:
+            RecipeIngredient.objects.bulk_create(created)
+        return bool(created or changed or deleted)
+
+    @transaction.atomic
     def update(self, instance, validated_data):
+        ingredients_changed = False
         if 'recipe_ingredient' in validated_data:
-            ingredients_data = validated_data.pop('recipe_ingredient')
-            instance.ingredients.clear()
-            self.add_ingredients(instance, ingredients_data)
+            ingredients_changed = self.update_ingredients(
+                instance, validated_data.pop('recipe_ingredient')
+            )
 
         if 'tags' in validated_data:
-            tags_data = validated_data.pop('tags')
-            instance.tags.set(tags_data)
-        return super().update(instance, validated_data)
+            # RelatedManager.set() only adds and removes the difference
+            instance.tags.set(validated_data.pop('tags'))
+
+        update_fields = []
+        for field, value in validated_data.items():
+            if getattr(instance, field) != value:
+                setattr(instance, field, value)
+                update_fields.append(field)
+        if update_fields:
+            instance.save(update_fields=update_fields)
+        if ingredients_changed:
+            bump_recipe_shopping_carts(instance.pk)
+        return instance
+
+
+# recipe fields FavoriteShoppingCartSerializer reads
+FAVORITE_SHOPPING_CART_FIELDS = (
+    'name', 'image', 'image_thumbnail', 'cooking_time'
+)
 
 
 class FavoriteShoppingCartSerializer(serializers.ModelSerializer):
@@ -207,7 +323,7 @@ class FavoriteShoppingCartSerializer(serializers.ModelSerializer):
     """
     id = serializers.ReadOnlyField(source='recipe.id')
     name = serializers.ReadOnlyField(source='recipe.name')
-    image = serializers.ImageField(source='recipe.image', read_only=True)
+    image = MediaURLField(source='recipe.preview_image')
     cooking_time = serializers.ReadOnlyField(source='recipe.cooking_time')
 
     class Meta:
@@ -237,3 +353,43 @@ class ShoppingCartSerializer(FavoriteShoppingCartSerializer):
     """
     class Meta(FavoriteShoppingCartSerializer.Meta):
         model = ShoppingCart
+
+
+class UserRecipeBatchSerializer(serializers.Serializer):
+    """
+    Recipe ids to add to and to remove from
+    the favorites or the shopping cart
+    """
+    add = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        max_length=settings.USER_RECIPE_BATCH_MAX_SIZE,
+        default=list,
+    )
+    remove = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        max_length=settings.USER_RECIPE_BATCH_MAX_SIZE,
+        default=list,
+    )
+
+    def validate(self, data):
+        add = list(dict.fromkeys(data['add']))
+        remove = list(dict.fromkeys(data['remove']))
+        if not add and not remove:
+            raise ValidationError(_('No recipes to add or remove'))
+        if set(add) & set(remove):
+            raise ValidationError(
+                _('A recipe cannot be added and removed at once')
+            )
+        return {'add': add, 'remove': remove}
+
+
+class ShoppingCartExportSerializer(serializers.ModelSerializer):
+    """
+    Shopping cart export job serializer
+    """
+    format = serializers.ReadOnlyField(source='file_format')
+
+    class Meta:
+        model = ShoppingCartExport
+        fields = ('id', 'format', 'status', 'created', 'finished')
+        read_only_fields = fields
@@ -1,92 +1,251 @@
-from django.db.models import F, Sum
+from hashlib import md5
+
+from django.conf import settings
+from django.db.models import Prefetch
+from django.http import HttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
 from django.utils.translation import gettext as _
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.reverse import reverse
 
 from api.filters import IngredientFilter, RecipeFilter
-from api.paginators import PageNumberLimitPagination
+from api.mixins import CatalogueCacheMixin
+from api.paginators import (
+    EstimatedPageNumberLimitPagination, FeedCursorPagination,
+    RecipeCursorPagination
+)
 from api.permissions import IsAuthorOrAdminOrReadOnly
-from core.utils import get_shopping_cart_pdf
+from api.renderers import SHOPPING_CART_RENDERERS
+from core.cache import (
+    cache_shopping_cart_document, get_shopping_cart_document,
+    get_shopping_cart_version
+)
+from core.search import ingredient_index
 from recipes.models import (
     Favorite, Ingredient, Recipe,
-    RecipeIngredient, ShoppingCart, Tag
+    RecipeIngredient, ShoppingCart, ShoppingCartExport, Tag
 )
 from .serializers import (
-    FavoriteSerializer, IngredientSerializer,
-    RecipeReadSerializer, RecipeWriteSerializer,
-    ShoppingCartSerializer, TagSerializer
+    FAVORITE_SHOPPING_CART_FIELDS, FavoriteSerializer, IngredientSerializer,
+    RecipeDetailSerializer, RecipeReadSerializer, RecipeWriteSerializer,
+    ShoppingCartExportSerializer, ShoppingCartSerializer, TagSerializer,
+    UserRecipeBatchSerializer
 )
 
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+class TagViewSet(CatalogueCacheMixin, viewsets.ReadOnlyModelViewSet):
     """
     Tag view
     """
+    catalogue = 'tags'
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     pagination_class = None
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(CatalogueCacheMixin, viewsets.ReadOnlyModelViewSet):
     """
     Ingredient view
     """
+    catalogue = 'ingredients'
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     pagination_class = None
     filter_backends = (DjangoFilterBackend,)
     filterset_class = IngredientFilter
 
+    def list(self, request, *args, **kwargs):
+        name = request.query_params.get('name')
+        if name and settings.INGREDIENT_SEARCH_INDEX:
+            return self.cached_response(self.search, request, name)
+        return super().list(request, *args, **kwargs)
+
+    def search(self, request, name):
+        return Response(ingredient_index.search(
+            name, settings.INGREDIENT_SEARCH_LIMIT,
+            version=self.catalogue_version
+        ))
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.action == 'list' and self.request.query_params.get('name'):
+            return queryset[:settings.INGREDIENT_SEARCH_LIMIT]
+        return queryset
+
 
 class RecipeViewSet(viewsets.ModelViewSet):
     """
     Recipe view
     """
     queryset = Recipe.objects.all()
+    lookup_value_regex = r'\d+'
     permission_classes = (IsAuthorOrAdminOrReadOnly,)
-    pagination_class = PageNumberLimitPagination
+    pagination_class = EstimatedPageNumberLimitPagination
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
 
+    @property
+    def paginator(self):
+        """
+        ?pagination=cursor switches the list to keyset pagination,
+        the feed is always read with a cursor
+        """
+        if not hasattr(self, '_paginator'):
+            if self.action == 'feed':
+                self._paginator = FeedCursorPagination()
+            elif self.request.query_params.get('pagination') == 'cursor':
+                self._paginator = RecipeCursorPagination()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
+
+    def get_queryset(self):
+        """
+        Load everything RecipeReadSerializer needs
+        in a fixed number of queries for any page size
+        """
+        queryset = super().get_queryset()
+        if self.request.method != 'GET':
+            return queryset
+        return queryset.with_user_flags(self.request.user).prefetch_related(
+            'tags',
+            Prefetch(
+                'recipe_ingredient',
+                queryset=RecipeIngredient.objects.select_related('ingredient')
+            ),
+        )
+
     def get_serializer_class(self):
+        if self.action == 'retrieve':
+            return RecipeDetailSerializer
         if self.request.method == 'GET':
             return RecipeReadSerializer
         return RecipeWriteSerializer
 
+    @action(
+        methods=['GET'],
+        detail=False,
+        url_path='feed',
+        permission_classes=(IsAuthenticated,)
+    )
+    def feed(self, request):
+        """
+        Recipes of the authors the user is subscribed to, newest first
+        """
+        recipe_ids = self.paginator.paginate_feed(request, request.user)
+        recipes = self.get_queryset().in_bulk(recipe_ids)
+        serializer = self.get_serializer(
+            [recipes[pk] for pk in recipe_ids if pk in recipes], many=True
+        )
+        return self.get_paginated_response(serializer.data)
+
     def favorite_and_shopping_cart(self, **kwargs):
+        """
+        POST adds the recipe and DELETE removes it with one statement,
+        the added recipe is read by the same statement
+        and is looked up only when nothing changed
+        """
         request = kwargs['request']
         user = request.user
-        recipe = get_object_or_404(Recipe, id=kwargs['pk'])
-        serializer = kwargs['serializer'](
-            recipe, context={"request": request}
-        )
+        recipe_id = int(kwargs['pk'])
         class_obj = kwargs['class']
 
         if request.method == 'POST':
-            if class_obj.objects.filter(user=user, recipe=recipe).exists():
+            added = class_obj.objects.add(
+                user, [recipe_id], fields=FAVORITE_SHOPPING_CART_FIELDS
+            )
+            if not added:
+                get_object_or_404(Recipe.objects.only('pk'), id=recipe_id)
                 return Response(
                     {'errors': _('The recipe has already been added')},
                     status=status.HTTP_400_BAD_REQUEST
                 )
-            class_obj.objects.create(user=user, recipe=recipe)
+            serializer = kwargs['serializer'](
+                class_obj(user=user, recipe=added[0]),
+                context={"request": request}
+            )
             return Response(serializer.data, status=status.HTTP_201_CREATED)
 
-        obj = class_obj.objects.filter(user=user, recipe=recipe)
-        if obj.exists():
-            obj.delete()
+        if class_obj.objects.remove(user, [recipe_id]):
             return Response(
                 {'detail': _('Recipe removed')},
                 status=status.HTTP_204_NO_CONTENT
             )
+        get_object_or_404(Recipe.objects.only('pk'), id=recipe_id)
         return Response(
             {'errors': _('Error deleting')},
             status=status.HTTP_400_BAD_REQUEST
         )
 
+    def batch_user_recipes(self, request, model):
+        """
+        Add and remove lists of recipes with one statement each
+        in a transaction, reporting the result for every id
+        """
+        serializer = UserRecipeBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        user = request.user
+        add = serializer.validated_data['add']
+        remove = serializer.validated_data['remove']
+
+        added, removed = map(set, model.objects.change(user, add, remove))
+        unchanged = {*add, *remove} - added - removed
+        existing = set(Recipe.objects.filter(
+            pk__in=unchanged
+        ).values_list('pk', flat=True)) if unchanged else set()
+
+        results = [
+            {'id': pk, 'status': (
+                'added' if pk in added
+                else 'already_added' if pk in existing
+                else 'not_found'
+            )}
+            for pk in add
+        ] + [
+            {'id': pk, 'status': (
+                'removed' if pk in removed
+                else 'not_added' if pk in existing
+                else 'not_found'
+            )}
+            for pk in remove
+        ]
+        return Response({'results': results})
+
+    @action(
+        methods=['POST'],
+        detail=False,
+        url_path='favorite',
+        url_name='favorite-batch',
+        permission_classes=(IsAuthenticated,)
+    )
+    def favorite_batch(self, request):
+        return self.batch_user_recipes(request, Favorite)
+
+    @action(
+        methods=['POST', 'DELETE'],
+        detail=False,
+        url_path='shopping_cart',
+        url_name='shopping-cart-batch',
+        permission_classes=(IsAuthenticated,)
+    )
+    def shopping_cart_batch(self, request):
+        """
+        POST: add and remove lists of recipes.
+        DELETE: clear the shopping cart
+        """
+        if request.method == 'POST':
+            return self.batch_user_recipes(request, ShoppingCart)
+        return Response({'results': [
+            {'id': pk, 'status': 'removed'}
+            for pk in ShoppingCart.objects.remove(request.user)
+        ]})
+
     @action(
         methods=['POST', 'DELETE'],
         detail=True,
@@ -118,27 +277,150 @@ class RecipeViewSet(viewsets.ModelViewSet):
         return self.favorite_and_shopping_cart(**kwargs)
 
     @action(
-        methods=['GET'],
+        methods=['GET', 'POST'],
         detail=False,
         url_path='download_shopping_cart',
-        permission_classes=(IsAuthenticated,)
+        permission_classes=(IsAuthenticated,),
+        renderer_classes=SHOPPING_CART_RENDERERS
     )
     def download_shopping_cart(self, request):
+        """
+        GET: the shopping list, rendered in the request for small carts.
+        POST: queue the shopping list for the shoppingcartworker command,
+        a failed export of the same cart is queued again
+        """
+        user = request.user
+        renderer = request.accepted_renderer
+        version = get_shopping_cart_version(user.id)
+        if request.method == 'POST':
+            if not ShoppingCart.objects.filter(user=user).exists():
+                return Response(
+                    {'details': _(
+                        'There are no recipes in the shopping cart'
+                    )},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            export = self.queue_shopping_cart_export(user, version)
+            if export.status == ShoppingCartExport.Status.FAILED:
+                export.status = ShoppingCartExport.Status.PENDING
+                export.finished = None
+                export.save(update_fields=('status', 'finished'))
+            return self.shopping_cart_export_status(export)
+
+        etag = quote_etag(
+            md5(f'{user.id}:{version}:{renderer.format}'.encode()).hexdigest()
+        )
+        last_modified = version // 10 ** 9
+
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            response = self.get_shopping_cart_document(user, version)
+        if response.status_code not in (
+            status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED
+        ):
+            return response
+
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
 
-        recipe_ingredients = RecipeIngredient.objects.filter(
-            recipe__shoppingcart__user=request.user
+    def get_shopping_cart_document(self, user, version):
+        """
+        Cached document of this cart version, a freshly rendered one
+        or the export of this version for large carts
+        """
+        renderer = self.request.accepted_renderer
+        document = get_shopping_cart_document(
+            user.id, version, renderer.format
         )
-        ingredients = recipe_ingredients.values(
-            name=F('ingredient__name'), unit=F('ingredient__measurement_unit')
-        ).annotate(total=Sum('amount'))
+        if document is not None:
+            content, headers = document
+            response = HttpResponse(content)
+            for header, value in headers.items():
+                response[header] = value
+            return response
 
-        if not ingredients:
+        recipes_count = ShoppingCart.objects.filter(user=user).count()
+        if not recipes_count:
             return Response(
                 {'details': _('There are no recipes in the shopping cart')},
                 status=status.HTTP_400_BAD_REQUEST
             )
+        if recipes_count > settings.SHOPPING_CART_SYNC_MAX_RECIPES:
+            return self.shopping_cart_export_response(
+                self.queue_shopping_cart_export(user, version)
+            )
+
+        ingredients = RecipeIngredient.objects.shopping_cart_totals(user)
+        return cache_shopping_cart_document(
+            renderer.export(ingredients.iterator()),
+            user.id, version, renderer.format
+        )
+
+    def queue_shopping_cart_export(self, user, version):
+        """
+        The export of this cart version and format,
+        queued once however many times it is requested
+        """
+        return ShoppingCartExport.objects.get_or_create(
+            user=user,
+            cart_version=version,
+            file_format=self.request.accepted_renderer.format
+        )[0]
+
+    def shopping_cart_export_status(self, export):
+        """
+        Export job with the location of its document,
+        202 until the document is rendered
+        """
+        location = reverse(
+            'api:recipes-shopping-cart-export',
+            kwargs={'export_id': export.id},
+            request=self.request
+        )
+        if export.status == ShoppingCartExport.Status.DONE:
+            response_status = status.HTTP_200_OK
+        elif export.status == ShoppingCartExport.Status.FAILED:
+            response_status = status.HTTP_409_CONFLICT
+        else:
+            response_status = status.HTTP_202_ACCEPTED
+        return Response(
+            ShoppingCartExportSerializer(export).data,
+            status=response_status,
+            headers={'Location': location}
+        )
 
-        data = [[q["name"], q["unit"], q["total"]] for q in ingredients]
-        data.insert(0, ["Продукт", "Ед.изм.", "Кол-во"])
-        pdf = get_shopping_cart_pdf(data)
-        return pdf
+    def shopping_cart_export_response(self, export):
+        """
+        The rendered document, or the job status while it is not ready
+        """
+        if export.status != ShoppingCartExport.Status.DONE:
+            return self.shopping_cart_export_status(export)
+        response = HttpResponse(
+            export.document, content_type=export.content_type
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="shopping_cart.{export.file_format}"'
+        )
+        return response
+
+    @action(
+        methods=['GET'],
+        detail=False,
+        url_path=r'download_shopping_cart/(?P<export_id>\d+)',
+        url_name='shopping-cart-export',
+        permission_classes=(IsAuthenticated,),
+        renderer_classes=SHOPPING_CART_RENDERERS
+    )
+    def shopping_cart_export(self, request, export_id=None):
+        """
+        Queued shopping list: the document once it is rendered,
+        409 if rendering failed
+        """
+        export = get_object_or_404(
+            ShoppingCartExport, id=export_id, user=request.user
+        )
+        return self.shopping_cart_export_response(export)
@@ -0,0 +1,126 @@
+import csv
+import json
+
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+from core.utils import get_shopping_cart_pdf
+
+SHOPPING_CART_HEADER = ('Продукт', 'Ед.изм.', 'Кол-во')
+
+
+class ShoppingCartRenderer(BaseRenderer):
+    """
+    Base shopping cart export renderer.
+    Documents are built by export(),
+    render() is only used for error payloads
+    """
+    charset = 'utf-8'
+    filename = 'shopping_cart'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        response = (renderer_context or {}).get('response')
+        if response is not None:
+            response['Content-Type'] = 'application/json'
+        return JSONRenderer().render(data)
+
+    def get_filename(self):
+        return f'{self.filename}.{self.format}'
+
+    def export(self, ingredients):
+        """
+        Build a response from rows of name, unit and total
+        """
+        raise NotImplementedError(
+            'ShoppingCartRenderer.export() must be implemented.'
+        )
+
+
+class ShoppingCartStreamingRenderer(ShoppingCartRenderer):
+    """
+    Base renderer for text formats streamed row by row
+    """
+
+    def stream(self, ingredients):
+        raise NotImplementedError(
+            'ShoppingCartStreamingRenderer.stream() must be implemented.'
+        )
+
+    def export(self, ingredients):
+        response = StreamingHttpResponse(
+            self.stream(ingredients),
+            content_type=f'{self.media_type}; charset={self.charset}'
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="{self.get_filename()}"'
+        )
+        return response
+
+
+class ShoppingCartPDFRenderer(ShoppingCartRenderer):
+    media_type = 'application/pdf'
+    format = 'pdf'
+    charset = None
+
+    def export(self, ingredients):
+        data = [[q['name'], q['unit'], q['total']] for q in ingredients]
+        data.insert(0, list(SHOPPING_CART_HEADER))
+        return get_shopping_cart_pdf(data)
+
+
+class ShoppingCartTXTRenderer(ShoppingCartStreamingRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+
+    def stream(self, ingredients):
+        yield 'Список покупок:\n\n'
+        for q in ingredients:
+            yield f'{q["name"]} ({q["unit"]}) — {q["total"]}\n'
+
+
+class Echo:
+    """
+    File-like object for csv.writer returning what is written
+    """
+
+    def write(self, value):
+        return value
+
+
+class ShoppingCartCSVRenderer(ShoppingCartStreamingRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+    def stream(self, ingredients):
+        writer = csv.writer(Echo())
+        yield writer.writerow(SHOPPING_CART_HEADER)
+        for q in ingredients:
+            yield writer.writerow((q['name'], q['unit'], q['total']))
+
+
+class ShoppingCartJSONRenderer(ShoppingCartStreamingRenderer):
+    media_type = 'application/json'
+    format = 'json'
+
+    def stream(self, ingredients):
+        yield '['
+        separator = ''
+        for q in ingredients:
+            yield separator + json.dumps(
+                {
+                    'name': q['name'],
+                    'measurement_unit': q['unit'],
+                    'amount': q['total'],
+                },
+                ensure_ascii=False
+            )
+            separator = ', '
+        yield ']'
+
+
+SHOPPING_CART_RENDERERS = (
+    ShoppingCartPDFRenderer,
+    ShoppingCartTXTRenderer,
+    ShoppingCartCSVRenderer,
+    ShoppingCartJSONRenderer,
+)
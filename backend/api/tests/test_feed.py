@@ -0,0 +1,73 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from recipes.models import FeedEntry, Recipe
+from users.models import Subscription
+
+User = get_user_model()
+
+
+@mock.patch('recipes.models.settings.FEED_FANOUT_MAX_SUBSCRIBERS', 1)
+class FeedFanOutThresholdTest(APITestCase):
+    """
+    Recipes stay in the feeds when the author's subscriber count
+    crosses FEED_FANOUT_MAX_SUBSCRIBERS
+    """
+
+    def setUp(self):
+        self.author = User.objects.create_user(
+            email='author@foodgram.ru', username='author',
+            first_name='author', last_name='author', password='pass'
+        )
+        self.users = [
+            User.objects.create_user(
+                email=f'user{i}@foodgram.ru', username=f'user{i}',
+                first_name='user', last_name=str(i), password='pass'
+            )
+            for i in range(3)
+        ]
+
+    def publish(self, name):
+        return Recipe.objects.create(
+            author=self.author, name=name, text=name,
+            image='recipes/images/recipe.png', cooking_time=10
+        )
+
+    def feed(self, user):
+        self.client.force_authenticate(user)
+        response = self.client.get('/api/recipes/feed/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [recipe['id'] for recipe in response.data['results']]
+
+    def test_count_drops_below_threshold(self):
+        for user in self.users[:2]:
+            Subscription.objects.add(user, [self.author.pk])
+        merged = self.publish('merged')
+        self.assertFalse(FeedEntry.objects.exists())
+
+        Subscription.objects.remove(self.users[0], [self.author.pk])
+        self.assertEqual(self.feed(self.users[1]), [merged.pk])
+        self.assertEqual(self.feed(self.users[0]), [])
+
+    def test_count_rises_above_threshold(self):
+        Subscription.objects.add(self.users[0], [self.author.pk])
+        fanned_out = self.publish('fanned out')
+        self.assertTrue(FeedEntry.objects.filter(
+            user=self.users[0], recipe=fanned_out
+        ).exists())
+
+        Subscription.objects.add(self.users[1], [self.author.pk])
+        merged = self.publish('merged')
+        Subscription.objects.add(self.users[2], [self.author.pk])
+        for user in self.users:
+            self.assertEqual(self.feed(user), [merged.pk, fanned_out.pk])
+
+        Subscription.objects.remove(self.users[2], [self.author.pk])
+        Subscription.objects.remove(self.users[1], [self.author.pk])
+        self.assertEqual(
+            self.feed(self.users[0]), [merged.pk, fanned_out.pk]
+        )
+        self.assertEqual(self.feed(self.users[1]), [])
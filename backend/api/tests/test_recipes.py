@@ -0,0 +1,139 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from recipes.models import (
+    Favorite, Ingredient, Recipe, RecipeIngredient, ShoppingCart, Tag
+)
+
+User = get_user_model()
+
+
+class RecipeUpdateTest(APITestCase):
+    """
+    Partial updates of a recipe by its author
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            email='author@foodgram.ru', username='author',
+            first_name='author', last_name='author', password='pass'
+        )
+        cls.tag = Tag.objects.create(
+            name='breakfast', color='#E26C2D', slug='breakfast'
+        )
+        cls.ingredient = Ingredient.objects.create(
+            name='salt', measurement_unit='g'
+        )
+        cls.recipe = Recipe.objects.create(
+            author=cls.author, name='omelette', text='whisk the eggs',
+            image='recipes/images/omelette.png', cooking_time=10
+        )
+        cls.recipe.tags.add(cls.tag)
+        RecipeIngredient.objects.create(
+            recipe=cls.recipe, ingredient=cls.ingredient, amount=5
+        )
+
+    def setUp(self):
+        self.client.force_authenticate(self.author)
+        self.url = f'/api/recipes/{self.recipe.pk}/'
+
+    def test_patch_without_ingredients(self):
+        response = self.client.patch(
+            self.url, {'name': 'scrambled eggs'}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['name'], 'scrambled eggs')
+        self.assertEqual(
+            [(item['id'], item['amount'])
+             for item in response.data['ingredients']],
+            [(self.ingredient.pk, 5)]
+        )
+
+    def test_patch_with_empty_ingredients(self):
+        response = self.client.patch(
+            self.url, {'ingredients': []}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_noop_patch_queries(self):
+        data = {
+            'name': self.recipe.name,
+            'text': self.recipe.text,
+            'cooking_time': self.recipe.cooking_time,
+            'tags': [self.tag.pk],
+            'ingredients': [{'id': self.ingredient.pk, 'amount': 5}],
+        }
+        # recipe, its author, submitted tags and ingredients,
+        # a savepoint around the stored ingredients and tags,
+        # the response prefetches; nothing is written
+        with self.assertNumQueries(10):
+            response = self.client.patch(self.url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class RecipeListQueriesTest(APITestCase):
+    """
+    The recipe list runs a fixed number of queries for any page size
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='user@foodgram.ru', username='user',
+            first_name='user', last_name='user', password='pass'
+        )
+        authors = [
+            User.objects.create_user(
+                email=f'author{i}@foodgram.ru', username=f'author{i}',
+                first_name='author', last_name=str(i), password='pass'
+            )
+            for i in range(3)
+        ]
+        tags = [
+            Tag.objects.create(
+                name=f'tag {i}', color=f'#00000{i}', slug=f'tag{i}'
+            )
+            for i in range(3)
+        ]
+        ingredients = [
+            Ingredient.objects.create(
+                name=f'ingredient {i}', measurement_unit='g'
+            )
+            for i in range(5)
+        ]
+        for i in range(40):
+            recipe = Recipe.objects.create(
+                author=authors[i % len(authors)],
+                name=f'recipe {i}', text=f'text {i}',
+                image='recipes/images/recipe.png', cooking_time=10
+            )
+            recipe.tags.set(tags[:1 + i % len(tags)])
+            RecipeIngredient.objects.bulk_create(
+                RecipeIngredient(
+                    recipe=recipe, ingredient=ingredient, amount=i + 1
+                )
+                for ingredient in ingredients[:1 + i % len(ingredients)]
+            )
+            if i % 2:
+                Favorite.objects.create(user=cls.user, recipe=recipe)
+            if i % 3:
+                ShoppingCart.objects.create(user=cls.user, recipe=recipe)
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def test_list_queries(self):
+        # count, recipes with the user flags, authors, tags, ingredients;
+        # PostgreSQL first reads the unfiltered count estimate
+        queries = 5 + (connection.vendor == 'postgresql')
+        for limit in (2, 30):
+            with self.subTest(limit=limit):
+                with self.assertNumQueries(queries):
+                    response = self.client.get(
+                        '/api/recipes/', {'limit': limit}
+                    )
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                self.assertEqual(len(response.data['results']), limit)
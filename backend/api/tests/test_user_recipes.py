@@ -0,0 +1,128 @@
+import random
+from threading import Thread
+
+from django.contrib.auth import get_user_model
+from django.db import connections
+from django.test import TransactionTestCase
+from rest_framework.test import APIClient
+
+from recipes.models import Favorite, Recipe, ShoppingCart
+from users.models import Subscription
+
+User = get_user_model()
+
+
+class UserRecipeConcurrencyTest(TransactionTestCase):
+    """
+    Concurrent favorite, shopping cart and subscribe toggles
+    and mixed favorite and shopping cart batches
+    """
+    threads = 8
+    requests_per_thread = 40
+
+    def setUp(self):
+        self.authors = [
+            User.objects.create_user(
+                email=f'author{i}@foodgram.ru', username=f'author{i}',
+                first_name='author', last_name=str(i), password='pass'
+            )
+            for i in range(2)
+        ]
+        self.users = [
+            User.objects.create_user(
+                email=f'user{i}@foodgram.ru', username=f'user{i}',
+                first_name='user', last_name=str(i), password='pass'
+            )
+            for i in range(4)
+        ]
+        self.recipes = [
+            Recipe.objects.create(
+                author=self.authors[i % len(self.authors)],
+                name=f'recipe {i}', text=f'text {i}',
+                image='recipes/images/recipe.png', cooking_time=10
+            )
+            for i in range(3)
+        ]
+        self.urls = [
+            f'/api/recipes/{recipe.pk}/{toggle}/'
+            for recipe in self.recipes
+            for toggle in ('favorite', 'shopping_cart')
+        ] + [f'/api/users/{author.pk}/subscribe/' for author in self.authors]
+        self.batch_urls = (
+            '/api/recipes/favorite/', '/api/recipes/shopping_cart/'
+        )
+
+    def crossing_batch(self, rng):
+        """
+        Add one recipe and remove another, concurrent batches
+        cross the same pair in opposite directions
+        """
+        first, second = rng.sample(
+            [recipe.pk for recipe in self.recipes], 2
+        )
+        return {'add': [first], 'remove': [second]}
+
+    def toggle(self, user, seed, statuses, errors):
+        client = APIClient()
+        client.force_authenticate(user)
+        rng = random.Random(seed)
+        try:
+            for _ in range(self.requests_per_thread):
+                method = rng.choice(('post', 'delete', 'batch'))
+                if method == 'batch':
+                    response = client.post(
+                        rng.choice(self.batch_urls),
+                        self.crossing_batch(rng), format='json'
+                    )
+                else:
+                    response = getattr(client, method)(rng.choice(self.urls))
+                statuses.append((method, response.status_code))
+        except Exception as error:
+            errors.append(error)
+        finally:
+            connections.close_all()
+
+    def test_counters_match_rows(self):
+        statuses, errors = [], []
+        threads = [
+            Thread(target=self.toggle, args=(
+                # two threads per user race on the same rows
+                self.users[i % len(self.users)], i, statuses, errors
+            ))
+            for i in range(self.threads)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(
+            len(statuses), self.threads * self.requests_per_thread
+        )
+        # 400 and 404 answer toggles that found nothing to change
+        self.assertLessEqual(set(statuses), {
+            ('post', 201), ('post', 400),
+            ('delete', 204), ('delete', 400), ('delete', 404),
+            ('batch', 200),
+        })
+        for recipe in Recipe.objects.all():
+            self.assertEqual(
+                recipe.favorites_count,
+                Favorite.objects.filter(recipe=recipe).count()
+            )
+            self.assertEqual(
+                recipe.carts_count,
+                ShoppingCart.objects.filter(recipe=recipe).count()
+            )
+        for author in User.objects.filter(pk__in=[
+            author.pk for author in self.authors
+        ]):
+            self.assertEqual(
+                author.subscribers_count,
+                Subscription.objects.filter(author=author).count()
+            )
+            self.assertEqual(
+                author.recipes_count,
+                Recipe.objects.filter(author=author).count()
+            )
@@ -0,0 +1,48 @@
+from django.contrib.auth import get_user_model
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from recipes.models import Recipe
+from users.models import Subscription
+
+User = get_user_model()
+
+
+class SubscriptionRecipesLimitTest(APITestCase):
+    """
+    recipes_limit of the subscriptions list
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='user@foodgram.ru', username='user',
+            first_name='user', last_name='user', password='pass'
+        )
+        cls.author = User.objects.create_user(
+            email='author@foodgram.ru', username='author',
+            first_name='author', last_name='author', password='pass'
+        )
+        for i in range(3):
+            Recipe.objects.create(
+                author=cls.author, name=f'recipe {i}', text=f'text {i}',
+                image='recipes/images/recipe.png', cooking_time=10
+            )
+        Subscription.objects.add(cls.user, [cls.author.pk])
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def test_recipes_limit(self):
+        for recipes_limit, count in (
+            ('0', 0), ('2', 2), ('', 3), ('-1', 3), ('many', 3)
+        ):
+            with self.subTest(recipes_limit=recipes_limit):
+                response = self.client.get(
+                    '/api/users/subscriptions/',
+                    {'recipes_limit': recipes_limit}
+                )
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                self.assertEqual(
+                    len(response.data['results'][0]['recipes']), count
+                )
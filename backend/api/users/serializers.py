@@ -1,8 +1,8 @@
 from django.contrib.auth import get_user_model
 from djoser.serializers import UserCreateSerializer, UserSerializer
-from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers
 
+from api.fields import MediaURLField
 from recipes.models import Recipe
 
 from users.models import Subscription
@@ -36,9 +36,14 @@ class CustomUserSerializer(UserSerializer):
         )
 
     def get_is_subscribed(self, obj):
+        # annotated by User.objects.with_subscription_flag
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         user = self.context['request'].user
+        # users cannot subscribe to themselves (check_author_not_self)
         return bool(
             user.is_authenticated
+            and obj.pk != user.pk
             and obj.subscribed.filter(user=user).exists()
         )
 
@@ -47,7 +52,7 @@ class RecipeSubscriptionSerializer(serializers.ModelSerializer):
     """
     Show recipe in subscription serializer
     """
-    image = Base64ImageField(read_only=True)
+    image = MediaURLField(source='preview_image')
     name = serializers.ReadOnlyField()
     cooking_time = serializers.ReadOnlyField()
 
@@ -56,13 +61,17 @@ class RecipeSubscriptionSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'image', 'cooking_time')
 
 
+# author fields SubscriptionSerializer reads
+SUBSCRIPTION_AUTHOR_FIELDS = (
+    'email', 'username', 'first_name', 'last_name', 'recipes_count'
+)
+
+
 class SubscriptionSerializer(CustomUserSerializer):
     """
     Subscription serializer
     """
-    recipes_count = serializers.ReadOnlyField(
-        source='author.recipes.count'
-    )
+    recipes_count = serializers.ReadOnlyField(source='author.recipes_count')
     recipes = serializers.SerializerMethodField()
     is_subscribed = serializers.SerializerMethodField()
     id = serializers.ReadOnlyField(source='author.id')
@@ -85,15 +94,17 @@ class SubscriptionSerializer(CustomUserSerializer):
         """
         Get recipes from the author the user is subscribed to
         """
-        request = self.context.get('request')
-        recipes_limit = (
-            request.parser_context['request'].
-            query_params.get('recipes_limit')
+        # prefetched by CustomUserViewSet.subscriptions
+        if hasattr(obj.author, 'preview_recipes'):
+            recipes = obj.author.preview_recipes
+        else:
+            recipes = obj.author.recipes.all()
+            recipes_limit = self.context.get('recipes_limit')
+            if recipes_limit is not None:
+                recipes = recipes[:recipes_limit]
+        serializer = RecipeSubscriptionSerializer(
+            recipes, many=True, context=self.context
         )
-        recipes = obj.author.recipes.all()
-        if recipes_limit:
-            recipes = recipes[:int(recipes_limit)]
-        serializer = RecipeSubscriptionSerializer(recipes, many=True)
         return serializer.data
 
     def get_is_subscribed(self, obj):
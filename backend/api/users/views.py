@@ -1,6 +1,8 @@
 from django.contrib.auth import get_user_model
-from django.db import IntegrityError
+from django.db.models import Prefetch, prefetch_related_objects
+from django.http import Http404
 from django.shortcuts import get_object_or_404
+from django.utils.translation import gettext as _
 from djoser.views import UserViewSet
 from rest_framework import status
 from rest_framework.decorators import action
@@ -8,8 +10,9 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
 from api.paginators import PageNumberLimitPagination
+from recipes.models import Recipe
 from users.models import Subscription
-from .serializers import SubscriptionSerializer
+from .serializers import SUBSCRIPTION_AUTHOR_FIELDS, SubscriptionSerializer
 
 User = get_user_model()
 
@@ -19,6 +22,23 @@ class CustomUserViewSet(UserViewSet):
     User view
     """
     pagination_class = PageNumberLimitPagination
+    lookup_value_regex = r'\d+'
+
+    def get_queryset(self):
+        return super().get_queryset().with_subscription_flag(
+            self.request.user
+        )
+
+    def get_recipes_limit(self):
+        """
+        recipes_limit query param, 0 for no recipes,
+        None when it is missing or invalid
+        """
+        try:
+            recipes_limit = int(self.request.query_params['recipes_limit'])
+        except (KeyError, ValueError):
+            return None
+        return recipes_limit if recipes_limit >= 0 else None
 
     @action(
         methods=['GET'],
@@ -28,12 +48,27 @@ class CustomUserViewSet(UserViewSet):
         pagination_class=PageNumberLimitPagination
     )
     def subscriptions(self, request):
-        subscriptions = Subscription.objects.filter(user=request.user)
-        self.paginate_queryset(subscriptions)
+        recipes_limit = self.get_recipes_limit()
+        subscriptions = Subscription.objects.filter(
+            user=request.user
+        ).select_related('author').order_by('author')
+        page = self.paginate_queryset(subscriptions)
+
+        recipes = Recipe.objects.filter(
+            author__in=[subscription.author_id for subscription in page]
+        )
+        if recipes_limit == 0:
+            recipes = recipes.none()
+        elif recipes_limit is not None:
+            recipes = recipes.limit_per_author(recipes_limit)
+        prefetch_related_objects(page, Prefetch(
+            'author__recipes', queryset=recipes, to_attr='preview_recipes'
+        ))
+
         serializer = SubscriptionSerializer(
-            subscriptions,
+            page,
             many=True,
-            context={'request': request}
+            context={'request': request, 'recipes_limit': recipes_limit}
         )
         return self.get_paginated_response(serializer.data)
 
@@ -44,27 +79,37 @@ class CustomUserViewSet(UserViewSet):
         permission_classes=(IsAuthenticated,)
     )
     def subscribe(self, request, id):
-        author = get_object_or_404(User, id=id)
+        """
+        POST subscribes and DELETE unsubscribes with one statement,
+        the new author is read by the same statement
+        and is looked up only when nothing changed
+        """
+        user = request.user
+        author_id = int(id)
 
         if request.method == 'POST':
-            try:
-                subscription = Subscription.objects.create(
-                    user=request.user, author=author
-                )
-                serializer = SubscriptionSerializer(
-                    subscription,
-                    context={'request': request}
-                )
-                return Response(
-                    serializer.data, status=status.HTTP_201_CREATED
-                )
-            except IntegrityError as e:
+            added = Subscription.objects.add(
+                user, [author_id], fields=SUBSCRIPTION_AUTHOR_FIELDS
+            )
+            if not added:
+                author = get_object_or_404(User, id=author_id)
                 return Response(
-                    {'errors': str(e)},
+                    {'errors': (
+                        _('You cannot subscribe to yourself')
+                        if author == user
+                        else _('You are already subscribed to this author')
+                    )},
                     status=status.HTTP_400_BAD_REQUEST
                 )
-        subscription = get_object_or_404(
-            Subscription, user=request.user, author=author
-        )
-        subscription.delete()
+            serializer = SubscriptionSerializer(
+                Subscription(user=user, author=added[0]),
+                context={
+                    'request': request,
+                    'recipes_limit': self.get_recipes_limit()
+                }
+            )
+            return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+        if not Subscription.objects.remove(user, [author_id]):
+            raise Http404
         return Response(status=status.HTTP_204_NO_CONTENT)
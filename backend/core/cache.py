@@ -0,0 +1,98 @@
+from time import monotonic
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from core.models import VersionStamp
+
+SHOPPING_CART_VERSION_KEY = 'shopping_cart_version:{}'
+SHOPPING_CART_DOCUMENT_KEY = 'shopping_cart:{}:{}:{}'
+CATALOGUE_VERSION_KEY = 'catalogue_version:{}'
+
+# catalogue: (version, monotonic time it expires), see get_catalogue_version
+catalogue_versions = {}
+
+
+def get_catalogue_version(catalogue):
+    """
+    Current version stamp of a catalogue (tags, ingredients),
+    kept in the database so every process sees the same one.
+    The stamp is reused for CATALOGUE_VERSION_TTL seconds,
+    bumps of other processes are seen at most that late
+    """
+    version, expires = catalogue_versions.get(catalogue, (None, 0))
+    if expires > monotonic():
+        return version
+    version = VersionStamp.objects.get_version(
+        CATALOGUE_VERSION_KEY.format(catalogue)
+    )
+    catalogue_versions[catalogue] = (
+        version, monotonic() + settings.CATALOGUE_VERSION_TTL
+    )
+    return version
+
+
+def bump_catalogue_version(catalogue):
+    """
+    Give the catalogue a new version stamp in the current transaction,
+    this process reads it again once the transaction commits
+    """
+    VersionStamp.objects.bump([CATALOGUE_VERSION_KEY.format(catalogue)])
+    catalogue_versions.pop(catalogue, None)
+    transaction.on_commit(lambda: catalogue_versions.pop(catalogue, None))
+
+
+def get_shopping_cart_version(user_id):
+    """
+    Current shopping cart version stamp of the user,
+    kept in the database so every process sees the same one
+    """
+    return VersionStamp.objects.get_version(
+        SHOPPING_CART_VERSION_KEY.format(user_id)
+    )
+
+
+def bump_shopping_cart_version(user_ids):
+    """
+    Give the shopping carts of the users a new version stamp
+    in the current transaction
+    """
+    VersionStamp.objects.bump(
+        SHOPPING_CART_VERSION_KEY.format(user_id) for user_id in user_ids
+    )
+
+
+def get_shopping_cart_document(user_id, version, file_format):
+    """
+    Cached document as (content, headers) or None
+    """
+    return cache.get(
+        SHOPPING_CART_DOCUMENT_KEY.format(user_id, version, file_format)
+    )
+
+
+def cache_shopping_cart_document(response, user_id, version, file_format):
+    """
+    Store the response body in the cache once it has been sent.
+    Documents larger than SHOPPING_CART_CACHE_MAX_SIZE are not stored
+    """
+    key = SHOPPING_CART_DOCUMENT_KEY.format(user_id, version, file_format)
+    headers = {
+        header: response[header]
+        for header in ('Content-Type', 'Content-Disposition')
+        if response.has_header(header)
+    }
+
+    def stream(chunks):
+        content, size = [], 0
+        for chunk in chunks:
+            size += len(chunk)
+            if size <= settings.SHOPPING_CART_CACHE_MAX_SIZE:
+                content.append(chunk)
+            yield chunk
+        if size <= settings.SHOPPING_CART_CACHE_MAX_SIZE:
+            cache.set(key, (b''.join(content), headers))
+
+    response.streaming_content = stream(response.streaming_content)
+    return response
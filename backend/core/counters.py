@@ -0,0 +1,40 @@
+from collections import defaultdict
+
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+
+def change_counters(model, field, deltas):
+    """
+    Add {pk: delta} to a counter column in SQL with F() expressions,
+    one UPDATE per distinct delta. Counters never drop below zero.
+    Several rows are first locked in pk order, so concurrent changes
+    of the same rows cannot deadlock; they must run in a transaction
+    """
+    pks_by_delta = defaultdict(list)
+    for pk, delta in deltas.items():
+        if delta:
+            pks_by_delta[delta].append(pk)
+    if sum(map(len, pks_by_delta.values())) > 1:
+        list(model.objects.select_for_update().filter(
+            pk__in=[pk for pks in pks_by_delta.values() for pk in pks]
+        ).order_by('pk').values_list('pk', flat=True))
+    for delta, pks in pks_by_delta.items():
+        value = F(field) + delta
+        if delta < 0:
+            value = Greatest(value, 0)
+        model.objects.filter(pk__in=pks).update(**{field: value})
+
+
+def count_related(related_model, related_field):
+    """
+    Subquery counting the rows of related_model
+    pointing to the outer row with related_field
+    """
+    return Coalesce(Subquery(
+        related_model.objects.filter(
+            **{related_field: OuterRef('pk')}
+        ).order_by().values(related_field).annotate(
+            count=Count('pk')
+        ).values('count')
+    ), 0)
@@ -0,0 +1,144 @@
+import re
+from itertools import combinations, product
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import RequestFactory
+from django.utils.translation import ugettext_lazy as _
+
+from api.filters import RECIPE_ORDERINGS, RecipeFilter
+from recipes.models import Favorite, Recipe, ShoppingCart, Tag
+
+User = get_user_model()
+
+# tables that must not be read with a sequential scan
+LARGE_TABLES = (
+    Recipe._meta.db_table,
+    Recipe.tags.through._meta.db_table,
+    Favorite._meta.db_table,
+    ShoppingCart._meta.db_table,
+)
+SEQUENTIAL_SCAN = {
+    'postgresql': re.compile(r'Seq Scan on (\w+)'),
+    'sqlite': re.compile(r'\bSCAN (?:TABLE )?(\w+)\b(?! USING)'),
+}
+
+
+class Command(BaseCommand):
+    help = _('Checking the query plans of the recipe filters and orderings')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help=_('Seed this many recipes, rolled back afterwards'),
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor not in SEQUENTIAL_SCAN:
+            raise CommandError(_(f'{connection.vendor} is not supported'))
+        with transaction.atomic():
+            if options['seed']:
+                self.seed(options['seed'])
+            failures = self.check_plans()
+            transaction.set_rollback(True)
+
+        if failures:
+            raise CommandError(_(
+                'Sequential scans in: ' + ', '.join(failures)
+            ))
+        self.stdout.write(self.style.SUCCESS(_('All query plans use indexes')))
+
+    def seed(self, recipes_count):
+        User.objects.bulk_create(
+            User(
+                username=f'plan_user_{number}',
+                email=f'plan_user_{number}@example.org',
+            )
+            for number in range(max(recipes_count // 100, 2))
+        )
+        Tag.objects.bulk_create(
+            Tag(
+                name=f'plan_tag_{number}',
+                color=f'#{number:06d}',
+                slug=f'plan_tag_{number}',
+            )
+            for number in range(10)
+        )
+        # primary keys are not returned by bulk_create on every database
+        users = list(User.objects.filter(username__startswith='plan_user_'))
+        tags = list(Tag.objects.filter(slug__startswith='plan_tag_'))
+        Recipe.objects.bulk_create(
+            Recipe(
+                name=f'plan_recipe_{number}',
+                author=users[number % len(users)],
+                text=f'plan_recipe_{number}',
+                image='recipes/images/plan.png',
+            )
+            for number in range(recipes_count)
+        )
+        recipes = list(
+            Recipe.objects.filter(name__startswith='plan_recipe_').only('pk')
+        )
+        Recipe.tags.through.objects.bulk_create(
+            Recipe.tags.through(
+                recipe=recipe, tag=tags[(number + shift) % len(tags)]
+            )
+            for number, recipe in enumerate(recipes)
+            for shift in range(2)
+        )
+        for model in (Favorite, ShoppingCart):
+            model.objects.bulk_create(
+                model(user=users[number % len(users)], recipe=recipe)
+                for number, recipe in enumerate(recipes[::7])
+            )
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                for table in LARGE_TABLES:
+                    cursor.execute(f'ANALYZE {table}')
+
+    def get_filter_params(self):
+        favorite = Favorite.objects.select_related('recipe').last()
+        tags = Tag.objects.values_list('slug', flat=True)[:2]
+        if favorite is None or not tags:
+            raise CommandError(_('Seed the database with --seed'))
+        params = {
+            'tags': list(tags),
+            'author': favorite.recipe.author_id,
+            'is_favorited': 1,
+            'is_in_shopping_cart': 1,
+        }
+        return favorite.user, params
+
+    def check_plans(self):
+        user, params = self.get_filter_params()
+        request = RequestFactory().get('/api/recipes/')
+        request.user = user
+        pattern = SEQUENTIAL_SCAN[connection.vendor]
+
+        failures = []
+        for size, ordering in product(
+            range(len(params) + 1), (None, *RECIPE_ORDERINGS)
+        ):
+            for names in combinations(params, size):
+                data = {name: params[name] for name in names}
+                label = '+'.join(names) or 'unfiltered'
+                if ordering:
+                    data['ordering'] = ordering
+                    label += f' ordering={ordering}'
+                queryset = RecipeFilter(
+                    data,
+                    queryset=Recipe.objects.with_user_flags(user),
+                    request=request,
+                ).qs[:settings.REST_FRAMEWORK['PAGE_SIZE']]
+                plan = queryset.explain()
+                tables = set(pattern.findall(plan)) & set(LARGE_TABLES)
+                if tables:
+                    failures.append(f'{label} ({", ".join(sorted(tables))})')
+                    self.stdout.write(self.style.ERROR(f'{label}:\n{plan}'))
+                else:
+                    self.stdout.write(f'{label}: ok')
+        return failures
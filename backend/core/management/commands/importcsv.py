@@ -1,11 +1,14 @@
 import csv
 import os.path
+import time
 
 from django.conf import settings
 from django.core.management.base import BaseCommand
 from django.utils.translation import ugettext_lazy as _
 
-from core.utils import load_ingredients_data, load_tags_data
+from core.utils import (
+    load_ingredients_data, load_tags_data, report_import
+)
 
 
 class Command(BaseCommand):
@@ -26,17 +29,19 @@ class Command(BaseCommand):
         }
         for file in files.values():
             path = os.path.join(settings.CSV_PATH, file.get('file_name'))
+            started = time.monotonic()
             with open(path, 'r') as csv_file:
                 data = csv.DictReader(
                     csv_file,
                     fieldnames=file.get('fieldnames')
                 )
-                file.get('import_func')(data)
-                self.stdout.write(
-                    self.style.SUCCESS(_(
-                        f'{file.get("file_name")} download completed'
-                    ))
-                )
+                counts = file.get('import_func')(data)
+            self.stdout.write(
+                self.style.SUCCESS(_(
+                    f'{file.get("file_name")} download completed: '
+                    + report_import(counts, time.monotonic() - started)
+                ))
+            )
 
         self.stdout.write(
             self.style.SUCCESS(_('Data download completed'))
@@ -1,20 +1,25 @@
-import json
+import time
 
 from django.conf import settings
 from django.core.management.base import BaseCommand
 from django.utils.translation import ugettext_lazy as _
 
-from core.utils import load_ingredients_data
+from core.utils import (
+    iter_json_array, load_ingredients_data, report_import
+)
 
 
 class Command(BaseCommand):
     help = _('Loading data from JSON')
 
     def handle(self, *args, **kwargs):
-        with open(settings.JSON_PATH, 'rb') as json_file:
-            data = json.load(json_file)
-            load_ingredients_data(data)
+        started = time.monotonic()
+        with open(settings.JSON_PATH, 'r', encoding='utf-8') as json_file:
+            counts = load_ingredients_data(iter_json_array(json_file))
 
         self.stdout.write(
-            self.style.SUCCESS(_('Data download completed'))
+            self.style.SUCCESS(_(
+                'Data download completed: '
+                + report_import(counts, time.monotonic() - started)
+            ))
         )
@@ -0,0 +1,52 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils.translation import ugettext_lazy as _
+
+from recipes.models import FeedEntry, Recipe
+from users.models import Subscription
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = _('Backfilling the subscription feeds')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rebuild',
+            action='store_true',
+            help=_('Delete all feed entries and write them anew'),
+        )
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            FeedEntry.objects.all().delete()
+        # recipes of these authors are merged into the feeds on read
+        merged = Recipe.objects.filter(
+            author__subscribers_count__gt=settings.FEED_FANOUT_MAX_SUBSCRIBERS
+        )
+        FeedEntry.objects.filter(recipe__in=merged).delete()
+        merged.update(fanned_out=False)
+        Recipe.objects.filter(
+            author__subscribers_count__lte=(
+                settings.FEED_FANOUT_MAX_SUBSCRIBERS
+            )
+        ).update(fanned_out=True)
+
+        authors = User.objects.filter(
+            subscribers_count__gt=0,
+            subscribers_count__lte=settings.FEED_FANOUT_MAX_SUBSCRIBERS,
+        ).values_list('pk', flat=True)
+        for author_id in authors.iterator():
+            FeedEntry.objects.backfill(
+                Subscription.objects.filter(
+                    author_id=author_id
+                ).values_list('user_id', flat=True),
+                [author_id],
+            )
+        self.stdout.write(self.style.SUCCESS(_(
+            f'feeds: {FeedEntry.objects.count()} entries'
+        )))
@@ -0,0 +1,76 @@
+import os.path
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils.translation import ugettext_lazy as _
+
+from core.utils import get_webp_image
+from recipes.models import Recipe
+
+VARIANTS = {
+    'image_thumbnail': settings.RECIPE_THUMBNAIL_SIZE,
+    'image_webp': settings.RECIPE_IMAGE_MAX_SIZE,
+}
+
+
+class Command(BaseCommand):
+    help = _('Rendering thumbnails and WebP variants of recipe images')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help=_('Exit when the queue is empty'),
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=1.0,
+            help=_('Seconds to wait for new images'),
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            if self.process_image():
+                continue
+            if options['once']:
+                break
+            time.sleep(options['sleep'])
+
+    @transaction.atomic
+    def process_image(self):
+        """
+        Render the variants of the oldest pending image.
+        The recipe stays locked meanwhile, concurrent workers skip it
+        and a new upload waits for the variants of the old one
+        """
+        recipe = Recipe.objects.select_for_update(
+            skip_locked=True
+        ).filter(
+            images_processed=False
+        ).order_by('pub_date').only('image').first()
+        if recipe is None:
+            return False
+
+        variants = {}
+        if recipe.image:
+            name = os.path.splitext(os.path.basename(recipe.image.name))[0]
+            try:
+                for field, size in VARIANTS.items():
+                    with recipe.image.open('rb') as image_file:
+                        content = get_webp_image(image_file, size)
+                    variant = getattr(recipe, field)
+                    Recipe.store_image(variant, f'{name}.webp', content)
+                    variants[field] = variant.name
+            except Exception as error:
+                # the original is served instead
+                variants = {}
+                self.stderr.write(
+                    self.style.ERROR(f'{recipe.pk} {recipe.image}: {error}')
+                )
+        Recipe.objects.filter(pk=recipe.pk).update(
+            images_processed=True, **variants
+        )
+        return True
@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F
+from django.utils.translation import ugettext_lazy as _
+
+from core.counters import count_related
+from recipes.models import Favorite, Recipe, ShoppingCart
+from users.models import CustomUser, Subscription
+
+# model, counter column, related model, related field
+COUNTERS = (
+    (Recipe, 'favorites_count', Favorite, 'recipe'),
+    (Recipe, 'carts_count', ShoppingCart, 'recipe'),
+    (CustomUser, 'recipes_count', Recipe, 'author'),
+    (CustomUser, 'subscribers_count', Subscription, 'author'),
+)
+
+
+class Command(BaseCommand):
+    help = _('Repairing drifted recipe and user counters')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help=_('Report the drifted counters without fixing them'),
+        )
+
+    def handle(self, *args, **options):
+        for model, field, related_model, related_field in COUNTERS:
+            with transaction.atomic():
+                drifted = self.recount(
+                    model, field, related_model, related_field,
+                    options['dry_run']
+                )
+            self.stdout.write(self.style.SUCCESS(_(
+                f'{model._meta.model_name}.{field}: {drifted} drifted'
+                + (' (dry run)' if options['dry_run'] else '')
+            )))
+
+    def recount(self, model, field, related_model, related_field, dry_run):
+        """
+        Count the rows whose counter differs from the actual count
+        and update only those
+        """
+        actual = count_related(related_model, related_field)
+        drifted = model.objects.annotate(
+            actual_count=actual
+        ).exclude(**{field: F('actual_count')})
+        if dry_run:
+            return drifted.count()
+        return model.objects.filter(
+            pk__in=drifted.values('pk')
+        ).update(**{field: actual})
@@ -0,0 +1,65 @@
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from django.utils.translation import ugettext_lazy as _
+
+from core.utils import iter_batches
+from recipes.models import Favorite, Recipe
+
+
+class Command(BaseCommand):
+    help = _('Refreshing trending scores of recipes')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--every',
+            type=float,
+            help=_('Repeat the refresh every given number of seconds'),
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            updated = self.refresh()
+            self.stdout.write(self.style.SUCCESS(_(
+                f'trending scores: updated {updated}'
+            )))
+            if not options['every']:
+                break
+            time.sleep(options['every'])
+
+    @transaction.atomic
+    def refresh(self):
+        """
+        Score every favorite of the window by its age,
+        halving its weight each TRENDING_HALF_LIFE seconds.
+        Only recipes favorited within the window
+        or still having a score are read and written
+        """
+        now = timezone.now()
+        scores = defaultdict(float)
+        for recipe_id, pub_date in Favorite.objects.filter(
+            pub_date__gte=now - timedelta(seconds=settings.TRENDING_WINDOW)
+        ).values_list('recipe_id', 'pub_date').iterator():
+            age = (now - pub_date).total_seconds()
+            scores[recipe_id] += 0.5 ** (age / settings.TRENDING_HALF_LIFE)
+
+        # a range of recipe_trending_idx
+        stale = set(Recipe.objects.filter(
+            trending_score__gt=0
+        ).values_list('pk', flat=True)) - scores.keys()
+        for batch in iter_batches(list(stale), settings.TRENDING_BATCH_SIZE):
+            Recipe.objects.filter(pk__in=batch).update(trending_score=0)
+        Recipe.objects.bulk_update(
+            [
+                Recipe(pk=recipe_id, trending_score=score)
+                for recipe_id, score in scores.items()
+            ],
+            ('trending_score',),
+            batch_size=settings.TRENDING_BATCH_SIZE,
+        )
+        return len(stale) + len(scores)
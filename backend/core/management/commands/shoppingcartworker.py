@@ -0,0 +1,101 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.translation import ugettext_lazy as _
+
+from api.renderers import SHOPPING_CART_RENDERERS
+from recipes.models import RecipeIngredient, ShoppingCartExport
+
+RENDERERS = {renderer.format: renderer for renderer in SHOPPING_CART_RENDERERS}
+
+
+class Command(BaseCommand):
+    help = _('Rendering queued shopping cart exports')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help=_('Exit when the queue is empty'),
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=1.0,
+            help=_('Seconds to wait for new exports'),
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            export = self.claim_export()
+            if export is not None:
+                self.render_export(export)
+                continue
+            self.delete_expired_exports()
+            if options['once']:
+                break
+            time.sleep(options['sleep'])
+
+    @transaction.atomic
+    def claim_export(self):
+        """
+        Take the oldest pending export, or one left processing
+        for longer than SHOPPING_CART_EXPORT_TIMEOUT by a crashed
+        worker, concurrent workers skip it
+        """
+        now = timezone.now()
+        export = ShoppingCartExport.objects.select_for_update(
+            skip_locked=True
+        ).filter(
+            Q(status=ShoppingCartExport.Status.PENDING)
+            | Q(
+                status=ShoppingCartExport.Status.PROCESSING,
+                started__lt=now - timedelta(
+                    seconds=settings.SHOPPING_CART_EXPORT_TIMEOUT
+                ),
+            )
+        ).select_related('user').first()
+        if export is not None:
+            export.status = ShoppingCartExport.Status.PROCESSING
+            export.started = now
+            export.save(update_fields=('status', 'started'))
+        return export
+
+    def render_export(self, export):
+        """
+        Render the cart as it is now, which may be newer than the
+        cart_version the export was queued for. Such a document is only
+        reached through the export's own location: GET of the shopping
+        list looks exports up by the current cart version
+        """
+        try:
+            renderer = RENDERERS[export.file_format]()
+            response = renderer.export(
+                RecipeIngredient.objects.shopping_cart_totals(
+                    export.user
+                ).iterator()
+            )
+            export.document = b''.join(response.streaming_content)
+            export.content_type = response['Content-Type']
+            export.status = ShoppingCartExport.Status.DONE
+        except Exception as error:
+            export.status = ShoppingCartExport.Status.FAILED
+            self.stderr.write(
+                self.style.ERROR(f'{export.pk} {export.file_format}: {error}')
+            )
+        export.finished = timezone.now()
+        export.save(update_fields=(
+            'document', 'content_type', 'status', 'finished'
+        ))
+
+    def delete_expired_exports(self):
+        ShoppingCartExport.objects.filter(
+            finished__lt=timezone.now() - timedelta(
+                seconds=settings.SHOPPING_CART_EXPORT_TTL
+            )
+        ).delete()
@@ -0,0 +1,172 @@
+import csv
+import os.path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils.translation import ugettext_lazy as _
+
+from core.cache import bump_catalogue_version
+from core.utils import iter_batches, iter_json_array
+from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
+
+
+class Command(BaseCommand):
+    help = _('Synchronizing ingredients and tags with the source files')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--ingredients',
+            default=os.path.join(settings.CSV_PATH, 'ingredients.csv'),
+            help=_('Ingredients CSV or JSON file'),
+        )
+        parser.add_argument(
+            '--tags',
+            default=os.path.join(settings.CSV_PATH, 'tags.csv'),
+            help=_('Tags CSV or JSON file'),
+        )
+        parser.add_argument(
+            '--delete',
+            action='store_true',
+            help=_('Delete rows missing from the files and not used'),
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help=_('Print the changes without applying them'),
+        )
+
+    def handle(self, *args, **options):
+        self.dry_run = options['dry_run']
+        self.verbose = self.dry_run or options['verbosity'] > 1
+        with transaction.atomic():
+            self.sync_ingredients(options['ingredients'], options['delete'])
+            self.sync_tags(options['tags'], options['delete'])
+
+    def read_source(self, path, fieldnames):
+        """
+        Rows of a CSV file without a header or of a JSON array
+        """
+        if not os.path.exists(path):
+            raise CommandError(_(f'{path} does not exist'))
+        with open(path, 'r', encoding='utf-8') as source_file:
+            if path.endswith('.json'):
+                yield from iter_json_array(source_file)
+            else:
+                yield from csv.DictReader(source_file, fieldnames=fieldnames)
+
+    def sync_ingredients(self, path, delete):
+        existing = {
+            (name, measurement_unit): pk
+            for pk, name, measurement_unit in Ingredient.objects.values_list(
+                'pk', 'name', 'measurement_unit'
+            )
+        }
+        source = {
+            (row['name'], row['measurement_unit'])
+            for row in self.read_source(path, ('name', 'measurement_unit'))
+        }
+        inserts = sorted(source - existing.keys())
+        deletes = []
+        if delete:
+            missing = [existing[key] for key in existing.keys() - source]
+            deletes = self.get_unused(
+                Ingredient,
+                RecipeIngredient.objects.filter(ingredient=OuterRef('pk')),
+                missing,
+            )
+
+        for name, measurement_unit in inserts:
+            self.write_change('+', f'{name} ({measurement_unit})')
+        for ingredient in deletes:
+            self.write_change('-', str(ingredient))
+
+        if not self.dry_run:
+            Ingredient.objects.bulk_create(
+                (
+                    Ingredient(name=name, measurement_unit=measurement_unit)
+                    for name, measurement_unit in inserts
+                ),
+                batch_size=settings.CATALOGUE_IMPORT_BATCH_SIZE,
+            )
+            self.delete(Ingredient, deletes)
+        self.write_summary('ingredients', len(inserts), 0, len(deletes))
+
+    def sync_tags(self, path, delete):
+        existing = {tag.slug: tag for tag in Tag.objects.all()}
+        source = {
+            row['slug']: (row['name'], row['color'])
+            for row in self.read_source(path, ('name', 'color', 'slug'))
+        }
+        inserts = sorted(source.keys() - existing.keys())
+        updates = []
+        for slug in sorted(source.keys() & existing.keys()):
+            tag = existing[slug]
+            if (tag.name, tag.color) != source[slug]:
+                self.write_change(
+                    '~', f'{slug}: {tag.name} {tag.color} -> '
+                    + ' '.join(source[slug])
+                )
+                tag.name, tag.color = source[slug]
+                updates.append(tag)
+        deletes = []
+        if delete:
+            missing = [
+                existing[slug].pk for slug in existing.keys() - source.keys()
+            ]
+            deletes = self.get_unused(
+                Tag,
+                Recipe.tags.through.objects.filter(tag=OuterRef('pk')),
+                missing,
+            )
+
+        for slug in inserts:
+            self.write_change('+', f'{slug}: ' + ' '.join(source[slug]))
+        for tag in deletes:
+            self.write_change('-', tag.slug)
+
+        if not self.dry_run:
+            Tag.objects.bulk_update(
+                updates,
+                ('name', 'color'),
+                batch_size=settings.CATALOGUE_IMPORT_BATCH_SIZE,
+            )
+            Tag.objects.bulk_create(
+                (
+                    Tag(name=source[slug][0], color=source[slug][1], slug=slug)
+                    for slug in inserts
+                ),
+                batch_size=settings.CATALOGUE_IMPORT_BATCH_SIZE,
+            )
+            self.delete(Tag, deletes)
+        self.write_summary('tags', len(inserts), len(updates), len(deletes))
+
+    def get_unused(self, model, usages, pks):
+        """
+        Objects among pks that no recipe refers to
+        """
+        unused = []
+        for batch in iter_batches(pks, settings.CATALOGUE_IMPORT_BATCH_SIZE):
+            unused.extend(
+                model.objects.filter(pk__in=batch).exclude(Exists(usages))
+            )
+        return unused
+
+    def delete(self, model, objects):
+        for batch in iter_batches(
+            [obj.pk for obj in objects], settings.CATALOGUE_IMPORT_BATCH_SIZE
+        ):
+            model.objects.filter(pk__in=batch).delete()
+
+    def write_change(self, sign, description):
+        if self.verbose:
+            self.stdout.write(f'{sign} {description}')
+
+    def write_summary(self, catalogue, inserted, updated, deleted):
+        if not self.dry_run and (inserted or updated or deleted):
+            bump_catalogue_version(catalogue)
+        self.stdout.write(self.style.SUCCESS(_(
+            f'{catalogue}: inserted {inserted}, updated {updated}, '
+            f'deleted {deleted}' + (' (dry run)' if self.dry_run else '')
+        )))
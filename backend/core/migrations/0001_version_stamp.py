@@ -0,0 +1,25 @@
+# Generated by Django 3.2.20 on 2026-10-18 03:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VersionStamp',
+            fields=[
+                ('key', models.CharField(max_length=100, primary_key=True, serialize=False, verbose_name='key')),
+                ('version', models.BigIntegerField(verbose_name='version')),
+            ],
+            options={
+                'verbose_name': 'version stamp',
+                'verbose_name_plural': 'version stamps',
+            },
+        ),
+    ]
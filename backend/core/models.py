@@ -0,0 +1,109 @@
+from time import time_ns
+
+from django.db import models
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils.translation import gettext_lazy as _
+
+from core.counters import change_counters
+
+
+class VersionStampQuerySet(models.QuerySet):
+    """
+    Version stamp queryset
+    """
+
+    def get_version(self, key):
+        """
+        Current version of the key, a missing row is created
+        with the current time so it is newer than any earlier stamp
+        """
+        version = self.filter(key=key).values_list(
+            'version', flat=True
+        ).first()
+        if version is None:
+            self.bulk_create(
+                [self.model(key=key, version=time_ns())],
+                ignore_conflicts=True
+            )
+            version = self.filter(key=key).values_list(
+                'version', flat=True
+            ).first()
+        return version
+
+    def bump(self, keys):
+        """
+        Give the keys new versions in the current transaction,
+        the other processes see them once it commits.
+        Missing rows are created on their next read
+        """
+        return self.filter(key__in=set(keys)).update(
+            version=Greatest(F('version') + 1, time_ns())
+        )
+
+
+class VersionStamp(models.Model):
+    """
+    Version of cached data shared by all processes,
+    cache keys built from it change when the data changes
+    """
+    key = models.CharField(_('key'), max_length=100, primary_key=True)
+    version = models.BigIntegerField(_('version'))
+
+    objects = VersionStampQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = _('version stamp')
+        verbose_name_plural = _('version stamps')
+
+    def __str__(self):
+        return f'{self.key}: {self.version}'
+
+
+class StoredFileQuerySet(models.QuerySet):
+    """
+    Stored file queryset
+    """
+
+    def acquire(self, names):
+        """
+        Count a new reference to each file. The rows stay locked
+        until the transaction ends, a concurrent release() waits
+        and does not delete the files
+        """
+        names = {name for name in names if name}
+        self.bulk_create(
+            [self.model(name=name) for name in names],
+            ignore_conflicts=True
+        )
+        change_counters(self.model, 'references', dict.fromkeys(names, 1))
+
+    def release(self, names):
+        """
+        Drop a reference to each file. Returns the names
+        no longer referenced, their rows are deleted
+        """
+        names = {name for name in names if name}
+        change_counters(self.model, 'references', dict.fromkeys(names, -1))
+        unused = list(self.filter(
+            name__in=names, references=0
+        ).values_list('name', flat=True))
+        self.filter(name__in=unused).delete()
+        return unused
+
+
+class StoredFile(models.Model):
+    """
+    Number of references to a file shared by identical uploads
+    """
+    name = models.CharField(_('name'), max_length=255, primary_key=True)
+    references = models.PositiveIntegerField(_('references'), default=0)
+
+    objects = StoredFileQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = _('stored file')
+        verbose_name_plural = _('stored files')
+
+    def __str__(self):
+        return f'{self.name}: {self.references}'
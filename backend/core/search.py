@@ -0,0 +1,74 @@
+from threading import Lock
+
+from core.cache import get_catalogue_version
+from recipes.models import Ingredient
+
+# trie node key holding positions of the names with the node prefix
+MATCHES = ''
+
+
+class IngredientIndex:
+    """
+    In-process ingredient autocomplete index.
+    Built from Ingredient rows on first use and rebuilt
+    when the ingredients catalogue version changes
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._version = None
+        self._rows = []
+        self._trie = {}
+
+    def _build(self):
+        rows, trie = [], {}
+        ingredients = Ingredient.objects.values(
+            'id', 'name', 'measurement_unit'
+        )
+        for position, ingredient in enumerate(ingredients):
+            name = ingredient['name'].casefold()
+            rows.append((name, ingredient))
+            node = trie
+            for char in name:
+                node = node.setdefault(char, {})
+                node.setdefault(MATCHES, []).append(position)
+        return rows, trie
+
+    def _refresh(self, version=None):
+        if version is None:
+            version = get_catalogue_version('ingredients')
+        if version == self._version:
+            return
+        with self._lock:
+            if version != self._version:
+                self._rows, self._trie = self._build()
+                self._version = version
+
+    def search(self, value, limit, version=None):
+        """
+        Ingredients whose names start with value, then the ones
+        containing it, in name order; case-insensitive.
+        version is the ingredients catalogue version
+        when the caller has already read it
+        """
+        self._refresh(version)
+        rows, node = self._rows, self._trie
+        value = value.casefold()
+        for char in value:
+            node = node.get(char)
+            if node is None:
+                break
+        prefix = node.get(MATCHES, []) if node is not None else []
+
+        results = [rows[position][1] for position in prefix[:limit]]
+        if len(results) < limit:
+            prefix = set(prefix)
+            for position, (name, ingredient) in enumerate(rows):
+                if value in name and position not in prefix:
+                    results.append(ingredient)
+                    if len(results) == limit:
+                        break
+        return results
+
+
+ingredient_index = IngredientIndex()
@@ -0,0 +1,103 @@
+from django.db import connections, router
+
+
+def insert_links(model, owner_field, owner_id, target_field, target_ids,
+                 returning=None, **values):
+    """
+    INSERT ... SELECT rows linking the owner to every existing target
+    among target_ids in one statement, rows violating a unique
+    constraint are skipped. Returns the ids of the linked targets,
+    or the targets with the returning fields loaded, read in the same
+    statement on PostgreSQL
+    """
+    target_ids = list(target_ids)
+    if not target_ids:
+        return []
+    meta = model._meta
+    owner = meta.get_field(owner_field)
+    target = meta.get_field(target_field)
+    target_meta = target.related_model._meta
+    connection = connections[router.db_for_write(model)]
+    ops = connection.ops
+    qn = ops.quote_name
+
+    fields = [meta.get_field(name) for name in values]
+    columns = ', '.join(
+        qn(field.column) for field in (owner, target, *fields)
+    )
+    placeholders = ', '.join(['%s'] * len(target_ids))
+    sql = (
+        f'{ops.insert_statement(ignore_conflicts=True)} '
+        f'{qn(meta.db_table)} ({columns}) '
+        f'SELECT %s, {qn(target_meta.pk.column)}'
+        + ''.join(', %s' for _ in fields)
+        + f' FROM {qn(target_meta.db_table)} '
+        f'WHERE {qn(target_meta.pk.column)} IN ({placeholders}) '
+        f'{ops.ignore_conflicts_suffix_sql(ignore_conflicts=True)} '
+        f'RETURNING {qn(target.column)}'
+    )
+    params = [
+        owner_id,
+        *(
+            field.get_db_prep_save(value, connection)
+            for field, value in zip(fields, values.values())
+        ),
+        *target_ids,
+    ]
+    if returning is None:
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return [row[0] for row in cursor.fetchall()]
+
+    targets = target.related_model._base_manager.db_manager(connection.alias)
+    if connection.vendor != 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            target_ids = [row[0] for row in cursor.fetchall()]
+        if not target_ids:
+            return []
+        return list(targets.only(*returning).filter(pk__in=target_ids))
+
+    target_columns = ', '.join(
+        qn(field.column) for field in (
+            target_meta.pk, *map(target_meta.get_field, returning)
+        )
+    )
+    sql = (
+        f'WITH linked AS ({sql}) '
+        f'SELECT {target_columns} FROM {qn(target_meta.db_table)} '
+        f'WHERE {qn(target_meta.pk.column)} IN '
+        f'(SELECT {qn(target.column)} FROM linked)'
+    )
+    return list(targets.raw(sql, params))
+
+
+def delete_links(model, owner_field, owner_id, target_field,
+                 target_ids=None):
+    """
+    DELETE the rows linking the owner to target_ids,
+    or to any target when target_ids is None, in one statement.
+    Returns the ids of the unlinked targets
+    """
+    meta = model._meta
+    owner = meta.get_field(owner_field)
+    target = meta.get_field(target_field)
+    connection = connections[router.db_for_write(model)]
+    qn = connection.ops.quote_name
+
+    sql = (
+        f'DELETE FROM {qn(meta.db_table)} '
+        f'WHERE {qn(owner.column)} = %s '
+    )
+    params = [owner_id]
+    if target_ids is not None:
+        target_ids = list(target_ids)
+        if not target_ids:
+            return []
+        placeholders = ', '.join(['%s'] * len(target_ids))
+        sql += f'AND {qn(target.column)} IN ({placeholders}) '
+        params += target_ids
+    sql += f'RETURNING {qn(target.column)}'
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [row[0] for row in cursor.fetchall()]
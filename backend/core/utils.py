@@ -1,9 +1,15 @@
+import json
+from collections import Counter
 from datetime import datetime
+from functools import lru_cache
 from io import BytesIO
+from itertools import islice
 
 from django.conf import settings
+from django.core.files.base import ContentFile
 from django.db import transaction
 from django.http import FileResponse
+from PIL import Image, ImageOps
 from reportlab.graphics.shapes import Drawing, Line
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import A4, portrait
@@ -14,15 +20,15 @@ from reportlab.pdfbase.ttfonts import TTFont
 from reportlab.platypus import SimpleDocTemplate, Table, TableStyle
 from reportlab.platypus.paragraph import Paragraph
 
+from core.cache import bump_catalogue_version
 from recipes.models import Ingredient, Tag
 
 
-def get_shopping_cart_pdf(data: list):
-    styles = getSampleStyleSheet()
-    styles['Heading1'].fontName = 'DejaVuSansMono'
-    styles['Heading2'].fontName = 'DejaVuSansMono'
-    styles['Normal'].fontName = 'DejaVuSansMono'
-
+@lru_cache(maxsize=None)
+def get_pdf_styles():
+    """
+    Register the font and build the stylesheet once per process
+    """
     registerFont(
         TTFont(
             'DejaVuSansMono',
@@ -33,6 +39,30 @@ def get_shopping_cart_pdf(data: list):
             'UTF-8',
         )
     )
+    styles = getSampleStyleSheet()
+    styles['Heading1'].fontName = 'DejaVuSansMono'
+    styles['Heading2'].fontName = 'DejaVuSansMono'
+    styles['Normal'].fontName = 'DejaVuSansMono'
+    return styles
+
+
+@lru_cache(maxsize=None)
+def get_pdf_table_style():
+    return TableStyle(
+        [
+            ('ALIGN', (0, 0), (-1, 0), 'CENTRE'),
+            ('SIZE', (0, 0), (-1, 0), 12),
+            ('ALIGN', (1, 0), (1, -1), 'CENTRE'),
+            ('ALIGN', (2, 0), (2, -1), 'CENTRE'),
+            ('INNERGRID', (0, 0), (-1, -1), 0.25, colors.black),
+            ('BOX', (0, 0), (-1, -1), 0.25, colors.black),
+            ('FONT', (0, 0), (-1, -1), 'DejaVuSansMono'),
+        ]
+    )
+
+
+def get_shopping_cart_pdf(data: list):
+    styles = get_pdf_styles()
 
     buffer = BytesIO()
     doc = SimpleDocTemplate(
@@ -63,19 +93,7 @@ def get_shopping_cart_pdf(data: list):
 
     table = Table(data, colWidths=[12.5 * cm, 2.5 * cm, 3 * cm])
 
-    table.setStyle(
-        TableStyle(
-            [
-                ('ALIGN', (0, 0), (-1, 0), 'CENTRE'),
-                ('SIZE', (0, 0), (-1, 0), 12),
-                ('ALIGN', (1, 0), (1, -1), 'CENTRE'),
-                ('ALIGN', (2, 0), (2, -1), 'CENTRE'),
-                ('INNERGRID', (0, 0), (-1, -1), 0.25, colors.black),
-                ('BOX', (0, 0), (-1, -1), 0.25, colors.black),
-                ('FONT', (0, 0), (-1, -1), 'DejaVuSansMono'),
-            ]
-        )
-    )
+    table.setStyle(get_pdf_table_style())
     story.append(table)
     story.append(Paragraph('<br />\n <br />\n'))
 
@@ -100,22 +118,142 @@ def get_shopping_cart_pdf(data: list):
     )
 
 
+def iter_batches(rows, batch_size):
+    """
+    Split an iterable into lists of at most batch_size items
+    """
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def iter_json_array(json_file, chunk_size=settings.JSON_CHUNK_SIZE):
+    """
+    Decode the objects of a JSON array one by one,
+    reading the file in chunks instead of loading it whole
+    """
+    decoder = json.JSONDecoder()
+    buffer, position = json_file.read(chunk_size).lstrip(), 0
+    if not buffer.startswith('['):
+        raise ValueError('JSON array expected')
+    position = 1
+    while True:
+        while position < len(buffer) and buffer[position] in ', \t\r\n':
+            position += 1
+        if position < len(buffer) and buffer[position] == ']':
+            return
+        try:
+            item, position = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            chunk = json_file.read(chunk_size)
+            if not chunk:
+                raise
+            buffer, position = buffer[position:] + chunk, 0
+            continue
+        yield item
+
+
+def get_webp_image(image_file, size):
+    """
+    Image scaled down to fit the size and encoded as WebP
+    """
+    with Image.open(image_file) as image:
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail(size)
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert(
+                'RGBA' if 'A' in image.getbands() else 'RGB'
+            )
+        buffer = BytesIO()
+        image.save(buffer, 'WEBP', quality=settings.WEBP_QUALITY)
+    return ContentFile(buffer.getvalue())
+
+
 @transaction.atomic
-def load_ingredients_data(ingredient_data):
-    for row in ingredient_data:
-        ingredient_name = row['name']
-        measurement_unit = row['measurement_unit']
-        ingredient, _ = Ingredient.objects.get_or_create(
-            name=ingredient_name, measurement_unit=measurement_unit
-        )
+def load_ingredients_data(
+    ingredient_data, batch_size=settings.CATALOGUE_IMPORT_BATCH_SIZE
+):
+    """
+    Insert new ingredients in batches,
+    returns the inserted, updated and skipped row counts
+    """
+    counts = Counter(inserted=0, updated=0, skipped=0)
+    seen = set()
+    for batch in iter_batches(ingredient_data, batch_size):
+        rows = {}
+        for row in batch:
+            key = (row['name'], row['measurement_unit'])
+            if key in seen:
+                counts['skipped'] += 1
+                continue
+            seen.add(key)
+            rows[key] = row
+        existing = set(
+            Ingredient.objects.filter(
+                name__in={name for name, _ in rows}
+            ).values_list('name', 'measurement_unit')
+        ) & rows.keys()
+        counts['skipped'] += len(existing)
+        new = [
+            Ingredient(name=name, measurement_unit=measurement_unit)
+            for name, measurement_unit in rows.keys() - existing
+        ]
+        Ingredient.objects.bulk_create(new, ignore_conflicts=True)
+        counts['inserted'] += len(new)
+    if counts['inserted']:
+        bump_catalogue_version('ingredients')
+    return counts
 
 
 @transaction.atomic
-def load_tags_data(tags_data):
-    for row in tags_data:
-        tag_name = row['name']
-        tag_color = row['color']
-        tag_slug = row['slug']
-        tag, _ = Tag.objects.get_or_create(
-            name=tag_name, color=tag_color, slug=tag_slug
+def load_tags_data(tags_data, batch_size=settings.CATALOGUE_IMPORT_BATCH_SIZE):
+    """
+    Insert new tags and update the name and color of existing ones
+    matched by slug, returns the inserted, updated and skipped row counts
+    """
+    counts = Counter(inserted=0, updated=0, skipped=0)
+    seen = set()
+    for batch in iter_batches(tags_data, batch_size):
+        rows = {}
+        for row in batch:
+            if row['slug'] in seen:
+                counts['skipped'] += 1
+                continue
+            seen.add(row['slug'])
+            rows[row['slug']] = row
+        changed = []
+        for tag in Tag.objects.filter(slug__in=rows):
+            row = rows.pop(tag.slug)
+            if (tag.name, tag.color) == (row['name'], row['color']):
+                counts['skipped'] += 1
+                continue
+            tag.name, tag.color = row['name'], row['color']
+            changed.append(tag)
+        Tag.objects.bulk_update(changed, ('name', 'color'))
+        counts['updated'] += len(changed)
+        Tag.objects.bulk_create(
+            (
+                Tag(name=row['name'], color=row['color'], slug=row['slug'])
+                for row in rows.values()
+            ),
+            ignore_conflicts=True,
         )
+        counts['inserted'] += len(rows)
+    if counts['inserted'] or counts['updated']:
+        bump_catalogue_version('tags')
+    return counts
+
+
+def report_import(counts, seconds):
+    """
+    Summary line of a catalogue import
+    """
+    rows = sum(counts.values())
+    return (
+        f'inserted {counts["inserted"]}, updated {counts["updated"]}, '
+        f'skipped {counts["skipped"]}, '
+        f'{rows / max(seconds, 1e-6):.0f} rows/s'
+    )
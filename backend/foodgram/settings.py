@@ -13,7 +13,11 @@ env = environ.Env(
     POSTGRES_USER=(str, 'django'),
     POSTGRES_PASSWORD=(str, 'pass1'),
     DB_HOST=(str, 'db'),
-    DB_PORT=(int, 5432)
+    DB_PORT=(int, 5432),
+    CACHE_BACKEND=(str, 'django.core.cache.backends.locmem.LocMemCache'),
+    CACHE_LOCATION=(str, 'foodgram'),
+    CACHE_MAX_ENTRIES=(int, 1000),
+    INGREDIENT_SEARCH_INDEX=(bool, True),
 )
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -94,6 +98,21 @@ DATABASES = {
     }
 }
 
+# Cache
+
+# rendered responses only, their version stamps are kept in the database
+# (core.models.VersionStamp) and are shared by all processes
+CACHES = {
+    'default': {
+        'BACKEND': env('CACHE_BACKEND'),
+        'LOCATION': env('CACHE_LOCATION'),
+        'TIMEOUT': 60 * 60 * 24,
+        'OPTIONS': {
+            'MAX_ENTRIES': env('CACHE_MAX_ENTRIES'),
+        },
+    }
+}
+
 # Password validation
 
 AUTH_USER_MODEL = 'users.CustomUser'
@@ -177,5 +196,37 @@ DJOSER = {
 # Constants
 CHAR_FIELD_MAX_LENGTH = 200
 COLOR_MAX_LENGTH = 7
+TEXT_HASH_LENGTH = 64
 MIN_TIME_VALUE = 1
 AMOUNT_MIN_VALUE = 1
+SHOPPING_CART_CACHE_MAX_SIZE = 1024 * 1024
+# carts with more recipes are rendered by the shoppingcartworker command
+SHOPPING_CART_SYNC_MAX_RECIPES = 30
+SHOPPING_CART_EXPORT_TTL = 60 * 60 * 24
+# processing exports older than this are claimed again
+SHOPPING_CART_EXPORT_TIMEOUT = 60 * 5
+EXPORT_FORMAT_MAX_LENGTH = 10
+EXPORT_STATUS_MAX_LENGTH = 10
+INGREDIENT_SEARCH_LIMIT = 20
+# answer ingredient autocomplete from core.search.IngredientIndex
+INGREDIENT_SEARCH_INDEX = env('INGREDIENT_SEARCH_INDEX')
+CATALOGUE_CACHE_MAX_AGE = 60
+# seconds a process reuses a catalogue version stamp
+CATALOGUE_VERSION_TTL = 5
+# unfiltered lists of larger tables are counted from pg_class
+COUNT_ESTIMATE_THRESHOLD = 10000
+CATALOGUE_IMPORT_BATCH_SIZE = 1000
+JSON_CHUNK_SIZE = 64 * 1024
+# recipe image variants rendered by the recipeimageworker command
+RECIPE_THUMBNAIL_SIZE = (480, 480)
+RECIPE_IMAGE_MAX_SIZE = (1280, 1280)
+WEBP_QUALITY = 80
+# ?ordering=trending weighs favorites of the window by their age
+TRENDING_HALF_LIFE = 60 * 60 * 24 * 3
+TRENDING_WINDOW = 60 * 60 * 24 * 14
+TRENDING_BATCH_SIZE = 1000
+# authors with more subscribers are merged into feeds on read
+FEED_FANOUT_MAX_SUBSCRIBERS = 1000
+FEED_BATCH_SIZE = 1000
+# recipe ids per batch request to the favorites or the shopping cart
+USER_RECIPE_BATCH_MAX_SIZE = 100
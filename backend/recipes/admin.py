@@ -2,7 +2,7 @@ from django.contrib import admin
 
 from .models import (
     Favorite, Ingredient, Recipe,
-    RecipeIngredient, ShoppingCart, Tag
+    RecipeIngredient, ShoppingCart, ShoppingCartExport, Tag
 )
 
 
@@ -26,16 +26,12 @@ class IngredientAdmin(admin.ModelAdmin):
 
 @admin.register(Recipe)
 class RecipeAdmin(admin.ModelAdmin):
-    list_display = ('name', 'author')
+    list_display = ('name', 'author', 'favorites_count', 'carts_count')
     list_filter = ('author', 'name', 'tags')
     search_fields = ('name',)
-    readonly_fields = ('favorite_count',)
+    readonly_fields = ('favorites_count', 'carts_count')
     inlines = (RecipeIngredientInline,)
 
-    @admin.display()
-    def favorite_count(self, instance):
-        return Favorite.objects.filter(recipe=instance).count()
-
 
 @admin.register(Favorite)
 class FavoriteAdmin(admin.ModelAdmin):
@@ -45,3 +41,10 @@ class FavoriteAdmin(admin.ModelAdmin):
 @admin.register(ShoppingCart)
 class ShoppingCartAdmin(admin.ModelAdmin):
     pass
+
+
+@admin.register(ShoppingCartExport)
+class ShoppingCartExportAdmin(admin.ModelAdmin):
+    list_display = ('user', 'file_format', 'status', 'created', 'finished')
+    list_filter = ('status', 'file_format')
+    exclude = ('document',)
@@ -0,0 +1,29 @@
+from hashlib import sha256
+
+from django.db import migrations, models
+
+
+def fill_text_hash(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    recipes = []
+    for recipe in Recipe.objects.only('text').iterator():
+        recipe.text_hash = sha256(recipe.text.encode()).hexdigest()
+        recipes.append(recipe)
+    Recipe.objects.bulk_update(recipes, ('text_hash',), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0006_recipe_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='text_hash',
+            field=models.CharField(default='', editable=False, max_length=64, verbose_name='recipe text hash'),
+            preserve_default=False,
+        ),
+        migrations.RunPython(fill_text_hash, migrations.RunPython.noop),
+    ]
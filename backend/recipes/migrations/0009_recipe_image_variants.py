@@ -0,0 +1,32 @@
+# Generated by Django 3.2.20 on 2026-10-18 03:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0008_recipe_unique_text_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='image_thumbnail',
+            field=models.ImageField(blank=True, editable=False, upload_to='recipes/thumbnails/', verbose_name='recipe image thumbnail'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='image_webp',
+            field=models.ImageField(blank=True, editable=False, upload_to='recipes/webp/', verbose_name='recipe image in WebP'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='images_processed',
+            field=models.BooleanField(default=False, editable=False, verbose_name='image variants are ready'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(condition=models.Q(('images_processed', False)), fields=['pub_date'], name='recipe_images_pending_idx'),
+        ),
+    ]
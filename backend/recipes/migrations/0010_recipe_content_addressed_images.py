@@ -0,0 +1,41 @@
+# Generated by Django 3.2.20 on 2026-10-18 03:17
+
+import core.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0009_recipe_image_variants'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='recipe',
+            name='image',
+            field=models.ImageField(storage=core.storage.ContentAddressedStorage(), upload_to='recipes/images/', verbose_name='recipe image'),
+        ),
+        migrations.AlterField(
+            model_name='recipe',
+            name='image_thumbnail',
+            field=models.ImageField(blank=True, editable=False, storage=core.storage.ContentAddressedStorage(), upload_to='recipes/thumbnails/', verbose_name='recipe image thumbnail'),
+        ),
+        migrations.AlterField(
+            model_name='recipe',
+            name='image_webp',
+            field=models.ImageField(blank=True, editable=False, storage=core.storage.ContentAddressedStorage(), upload_to='recipes/webp/', verbose_name='recipe image in WebP'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['image'], name='recipe_image_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['image_thumbnail'], name='recipe_image_thumbnail_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['image_webp'], name='recipe_image_webp_idx'),
+        ),
+    ]
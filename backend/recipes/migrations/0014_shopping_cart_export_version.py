@@ -0,0 +1,27 @@
+# Generated by Django 3.2.20 on 2026-10-18 03:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0013_feed_entry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shoppingcartexport',
+            name='cart_version',
+            field=models.BigIntegerField(null=True, verbose_name='cart version'),
+        ),
+        migrations.AddField(
+            model_name='shoppingcartexport',
+            name='started',
+            field=models.DateTimeField(null=True, verbose_name='started'),
+        ),
+        migrations.AddConstraint(
+            model_name='shoppingcartexport',
+            constraint=models.UniqueConstraint(fields=('user', 'cart_version', 'file_format'), name='unique_shopping_cart_export'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 3.2.20 on 2026-10-18 03:57
+
+from collections import Counter
+
+from django.db import migrations
+
+
+def count_stored_files(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    StoredFile = apps.get_model('core', 'StoredFile')
+    references = Counter()
+    for names in Recipe.objects.values_list(
+        'image', 'image_thumbnail', 'image_webp'
+    ).iterator():
+        references.update(name for name in names if name)
+    StoredFile.objects.bulk_create(
+        (
+            StoredFile(name=name, references=count)
+            for name, count in references.items()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_stored_file'),
+        ('recipes', '0015_recipe_fanned_out'),
+    ]
+
+    operations = [
+        migrations.RunPython(count_stored_files, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='recipe',
+            name='recipe_image_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='recipe',
+            name='recipe_image_thumbnail_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='recipe',
+            name='recipe_image_webp_idx',
+        ),
+    ]
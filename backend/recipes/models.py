@@ -1,12 +1,26 @@
+from hashlib import sha256
+
 from django.contrib.auth import get_user_model
 from django.core.validators import MinValueValidator
-from django.db import models
+from django.db import models, transaction
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import RowNumber
+from django.dispatch import Signal
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
+from core.models import StoredFile
+from core.sql import delete_links, insert_links
+from core.storage import content_addressed_storage
 from foodgram import settings
+from users.models import Subscription
 
 User = get_user_model()
 
+# sent with the favorites and cart rows written in SQL
+# by UserRecipeQuerySet, which sends no model signals
+user_recipes_changed = Signal()
+
 
 class Tag(models.Model):
     """
@@ -67,6 +81,60 @@ class Ingredient(models.Model):
         return f'{self.name} ({self.measurement_unit})'
 
 
+class RecipeQuerySet(models.QuerySet):
+    """
+    Recipe queryset
+    """
+
+    def with_user_flags(self, user):
+        """
+        Annotate is_favorited and is_in_shopping_cart for user
+        and prefetch authors annotated with is_subscribed
+        """
+        if user.is_authenticated:
+            queryset = self.annotate(
+                is_favorited=models.Exists(Favorite.objects.filter(
+                    user=user, recipe=models.OuterRef('pk')
+                )),
+                is_in_shopping_cart=models.Exists(
+                    ShoppingCart.objects.filter(
+                        user=user, recipe=models.OuterRef('pk')
+                    )
+                ),
+            )
+        else:
+            queryset = self.annotate(
+                is_favorited=models.Value(False),
+                is_in_shopping_cart=models.Value(False),
+            )
+        return queryset.prefetch_related(models.Prefetch(
+            'author',
+            queryset=User.objects.with_subscription_flag(user)
+        ))
+
+    def limit_per_author(self, limit):
+        """
+        Keep only the first `limit` recipes of every author,
+        numbering them with ROW_NUMBER() in SQL
+        """
+        ranked = self.annotate(
+            recipe_rank=models.Window(
+                expression=RowNumber(),
+                partition_by=models.F('author'),
+                order_by=[
+                    models.F('pub_date').desc(),
+                    models.F('name').asc(),
+                ],
+            )
+        ).values('pk', 'recipe_rank')
+        sql, params = ranked.query.sql_with_params()
+        return self.filter(pk__in=RawSQL(
+            f'SELECT ranked.id FROM ({sql}) ranked '
+            f'WHERE ranked.recipe_rank <= %s',
+            (*params, limit)
+        ))
+
+
 class Recipe(models.Model):
     """
     Recipe model
@@ -83,9 +151,37 @@ class Recipe(models.Model):
         on_delete=models.CASCADE,
     )
     text = models.TextField(_('recipe text'))
+    # recipes are unique by text through its hash, see save()
+    text_hash = models.CharField(
+        _('recipe text hash'),
+        max_length=settings.TEXT_HASH_LENGTH,
+        editable=False,
+    )
+    # files are shared by identical uploads, see store_image()
     image = models.ImageField(
         _('recipe image'),
         upload_to='recipes/images/',
+        storage=content_addressed_storage,
+    )
+    # variants rendered by the recipeimageworker command
+    image_thumbnail = models.ImageField(
+        _('recipe image thumbnail'),
+        upload_to='recipes/thumbnails/',
+        storage=content_addressed_storage,
+        blank=True,
+        editable=False,
+    )
+    image_webp = models.ImageField(
+        _('recipe image in WebP'),
+        upload_to='recipes/webp/',
+        storage=content_addressed_storage,
+        blank=True,
+        editable=False,
+    )
+    images_processed = models.BooleanField(
+        _('image variants are ready'),
+        default=False,
+        editable=False,
     )
     cooking_time = models.PositiveSmallIntegerField(
         _('cooking time'),
@@ -108,19 +204,170 @@ class Recipe(models.Model):
         _('publication date'),
         auto_now_add=True
     )
+    # maintained by recipes.signals, repaired by the recount command
+    favorites_count = models.PositiveIntegerField(
+        _('times favorited'),
+        default=0,
+        editable=False,
+    )
+    carts_count = models.PositiveIntegerField(
+        _('times in shopping carts'),
+        default=0,
+        editable=False,
+    )
+    # recent favorites weighted by age, see the refreshtrending command
+    trending_score = models.FloatField(
+        _('trending score'),
+        default=0,
+        editable=False,
+    )
+    # written to the subscribers' feeds when published,
+    # otherwise merged into the feeds on read, see FeedEntryQuerySet
+    fanned_out = models.BooleanField(
+        _('fanned out to the feeds'),
+        default=False,
+        editable=False,
+    )
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         ordering = ['-pub_date', 'name']
         verbose_name = _('recipe')
         verbose_name_plural = _('recipes')
         constraints = [models.UniqueConstraint(
-            fields=['author', 'name', 'text'],
+            fields=['author', 'name', 'text_hash'],
             name='unique_recipe_author'
         )]
+        indexes = [
+            models.Index(
+                fields=['-pub_date', 'name'],
+                name='recipe_pub_date_name_idx'
+            ),
+            models.Index(
+                fields=['author', '-pub_date', 'name'],
+                name='recipe_author_pub_date_idx'
+            ),
+            models.Index(
+                fields=['pub_date'],
+                name='recipe_images_pending_idx',
+                condition=models.Q(images_processed=False),
+            ),
+            # ?ordering=popular and ?ordering=trending
+            models.Index(
+                fields=['-favorites_count', '-pub_date', 'name'],
+                name='recipe_popular_idx'
+            ),
+            models.Index(
+                fields=['-trending_score', '-pub_date', 'name'],
+                name='recipe_trending_idx'
+            ),
+            # recipes merged into the feeds by FeedEntryQuerySet.page()
+            models.Index(
+                fields=['author', '-pub_date'],
+                name='recipe_merged_feed_idx',
+                condition=models.Q(fanned_out=False),
+            ),
+        ]
 
     def __str__(self):
         return f'{self.name} @{self.author}'
 
+    @staticmethod
+    def get_text_hash(text):
+        return sha256(text.encode()).hexdigest()
+
+    @property
+    def preview_image(self):
+        """
+        Thumbnail for lists, the original until it is rendered
+        """
+        return self.image_thumbnail or self.image
+
+    @property
+    def display_image(self):
+        """
+        WebP variant for the recipe page, the original until it is rendered
+        """
+        return self.image_webp or self.image
+
+    @staticmethod
+    def store_image(field_file, name, content):
+        """
+        Save the content under its hash holding a reference to the file.
+        The reference is counted before the file is looked up: a
+        concurrent release_images() either waits for this transaction
+        and keeps the file, or has deleted it and it is written again
+        """
+        StoredFile.objects.acquire([
+            content_addressed_storage.get_content_name(
+                field_file.field.generate_filename(
+                    field_file.instance, name
+                ),
+                content
+            )
+        ])
+        field_file.save(name, content, save=False)
+
+    @staticmethod
+    def release_images(names):
+        """
+        Drop the references to the files once the transaction commits,
+        deleting the files no longer referenced
+        """
+        names = {name for name in names if name}
+
+        def release():
+            with transaction.atomic():
+                for name in StoredFile.objects.release(names):
+                    content_addressed_storage.delete(name)
+
+        if names:
+            transaction.on_commit(release)
+
+    def save(self, *args, **kwargs):
+        self.text_hash = self.get_text_hash(self.text)
+        derived_fields = ['text_hash']
+        replaced_images = ()
+        if self.image and not self.image._committed:
+            # a new upload, its variants are rendered by the worker
+            self.store_image(self.image, self.image.name, self.image.file)
+            if self.pk is not None:
+                replaced_images = Recipe.objects.filter(
+                    pk=self.pk
+                ).values_list(
+                    'image', 'image_thumbnail', 'image_webp'
+                ).first() or ()
+            self.image_thumbnail = self.image_webp = ''
+            self.images_processed = False
+            derived_fields += [
+                'image_thumbnail', 'image_webp', 'images_processed'
+            ]
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'text', 'image'} & {*update_fields}:
+            kwargs['update_fields'] = {*update_fields, *derived_fields}
+        super().save(*args, **kwargs)
+        self.release_images(replaced_images)
+
+
+class RecipeIngredientQuerySet(models.QuerySet):
+    """
+    Recipe ingredient queryset
+    """
+
+    def shopping_cart_totals(self, user):
+        """
+        Ingredients of the user's shopping cart summed up in SQL
+        """
+        return self.filter(
+            recipe__shoppingcart__user=user
+        ).values(
+            name=models.F('ingredient__name'),
+            unit=models.F('ingredient__measurement_unit')
+        ).annotate(
+            total=models.Sum('amount')
+        ).order_by('name', 'unit')
+
 
 class RecipeIngredient(models.Model):
     """
@@ -144,6 +391,8 @@ class RecipeIngredient(models.Model):
         default=settings.AMOUNT_MIN_VALUE
     )
 
+    objects = RecipeIngredientQuerySet.as_manager()
+
     class Meta:
         verbose_name = _('recipe ingredient')
         verbose_name_plural = _('recipe ingredients')
@@ -156,6 +405,79 @@ class RecipeIngredient(models.Model):
         return f'{self.ingredient.name} -> {self.recipe.name}'
 
 
+class UserRecipeQuerySet(models.QuerySet):
+    """
+    Favorite and shopping cart queryset
+    """
+
+    def add(self, user, recipe_ids, fields=None):
+        """
+        Add the existing recipes among recipe_ids with one statement,
+        recipes already added are skipped.
+        Returns the ids of the added recipes,
+        or the recipes with the given fields loaded
+        """
+        with transaction.atomic(using=self.db):
+            added = insert_links(
+                self.model, 'user', user.pk, 'recipe', recipe_ids,
+                returning=fields, pub_date=timezone.now(),
+            )
+            if added:
+                user_recipes_changed.send(
+                    sender=self.model,
+                    user_id=user.pk,
+                    deltas=dict.fromkeys(
+                        added if fields is None
+                        else [recipe.pk for recipe in added],
+                        1
+                    ),
+                )
+            return added
+
+    def remove(self, user, recipe_ids=None):
+        """
+        Remove the recipes, all of them when recipe_ids is None,
+        with one statement. Returns the ids of the removed recipes
+        """
+        with transaction.atomic(using=self.db):
+            removed = delete_links(
+                self.model, 'user', user.pk, 'recipe', recipe_ids
+            )
+            if removed:
+                user_recipes_changed.send(
+                    sender=self.model,
+                    user_id=user.pk,
+                    deltas=dict.fromkeys(removed, -1),
+                )
+            return removed
+
+    def change(self, user, add, remove):
+        """
+        Add and remove recipes with one statement each, the changes
+        are signalled together so the counters of the whole batch
+        are updated at once. Returns the ids of the added
+        and of the removed recipes
+        """
+        with transaction.atomic(using=self.db):
+            added = insert_links(
+                self.model, 'user', user.pk, 'recipe', add,
+                pub_date=timezone.now(),
+            )
+            removed = delete_links(
+                self.model, 'user', user.pk, 'recipe', remove
+            )
+            if added or removed:
+                user_recipes_changed.send(
+                    sender=self.model,
+                    user_id=user.pk,
+                    deltas={
+                        **dict.fromkeys(added, 1),
+                        **dict.fromkeys(removed, -1),
+                    },
+                )
+            return added, removed
+
+
 class UserRecipe(models.Model):
     """
     Model to display Recipe in User panel
@@ -175,6 +497,8 @@ class UserRecipe(models.Model):
         auto_now_add=True
     )
 
+    objects = UserRecipeQuerySet.as_manager()
+
     class Meta:
         abstract = True
 
@@ -197,6 +521,14 @@ class Favorite(UserRecipe):
             fields=['user', 'recipe'],
             name='unique_recipe_user_favorite'
         )]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date'],
+                name='favorite_user_pub_date_idx'
+            ),
+            # recent favorites read by the refreshtrending command
+            models.Index(fields=['pub_date'], name='favorite_pub_date_idx'),
+        ]
 
 
 class ShoppingCart(UserRecipe):
@@ -211,3 +543,187 @@ class ShoppingCart(UserRecipe):
             fields=['user', 'recipe'],
             name='unique_recipe_user_shopping_cart'
         )]
+        indexes = [models.Index(
+            fields=['user', '-pub_date'],
+            name='cart_user_pub_date_idx'
+        )]
+
+
+class ShoppingCartExport(models.Model):
+    """
+    Shopping cart export job rendered by the shoppingcartworker command
+    """
+    class Status(models.TextChoices):
+        PENDING = 'pending', _('pending')
+        PROCESSING = 'processing', _('processing')
+        DONE = 'done', _('done')
+        FAILED = 'failed', _('failed')
+
+    user = models.ForeignKey(
+        User,
+        verbose_name=_('user'),
+        related_name='shopping_cart_exports',
+        on_delete=models.CASCADE,
+    )
+    file_format = models.CharField(
+        _('file format'),
+        max_length=settings.EXPORT_FORMAT_MAX_LENGTH,
+    )
+    # shopping cart version stamp the export was queued for,
+    # the worker renders the cart as it is when the export is claimed
+    cart_version = models.BigIntegerField(_('cart version'), null=True)
+    status = models.CharField(
+        _('export status'),
+        max_length=settings.EXPORT_STATUS_MAX_LENGTH,
+        choices=Status.choices,
+        default=Status.PENDING,
+        db_index=True,
+    )
+    content_type = models.CharField(
+        _('content type'),
+        max_length=settings.CHAR_FIELD_MAX_LENGTH,
+        blank=True,
+    )
+    document = models.BinaryField(_('document'), null=True)
+    created = models.DateTimeField(_('created'), auto_now_add=True)
+    started = models.DateTimeField(_('started'), null=True)
+    finished = models.DateTimeField(_('finished'), null=True)
+
+    class Meta:
+        ordering = ['created']
+        verbose_name = _('shopping cart export')
+        verbose_name_plural = _('shopping cart exports')
+        constraints = [models.UniqueConstraint(
+            fields=['user', 'cart_version', 'file_format'],
+            name='unique_shopping_cart_export'
+        )]
+
+    def __str__(self):
+        return (
+            f'{self.user.get_username()} {self.file_format} '
+            f'{self.get_status_display()}'
+        )
+
+
+class FeedEntryQuerySet(models.QuerySet):
+    """
+    Feed entry queryset
+    """
+
+    def fan_out(self, recipe):
+        """
+        Add the recipe to the feeds of its author's subscribers and mark
+        it fanned out. Recipes of authors with more than
+        FEED_FANOUT_MAX_SUBSCRIBERS subscribers are left unmarked
+        and merged into the feeds on read, see page(), whatever
+        the author's subscriber count becomes later
+        """
+        if User.objects.filter(
+            pk=recipe.author_id,
+            subscribers_count__gt=settings.FEED_FANOUT_MAX_SUBSCRIBERS,
+        ).exists():
+            return
+        Recipe.objects.filter(pk=recipe.pk).update(fanned_out=True)
+        recipe.fanned_out = True
+        self.bulk_create(
+            (
+                FeedEntry(
+                    user_id=user_id, recipe=recipe, pub_date=recipe.pub_date
+                )
+                for user_id in Subscription.objects.filter(
+                    author_id=recipe.author_id
+                ).values_list('user_id', flat=True).iterator()
+            ),
+            batch_size=settings.FEED_BATCH_SIZE,
+            ignore_conflicts=True,
+        )
+
+    def backfill(self, user_ids, author_ids):
+        """
+        Add the fanned out recipes of the authors to the feeds
+        of the users, the others are merged on read
+        """
+        recipes = list(Recipe.objects.filter(
+            author__in=author_ids, fanned_out=True,
+        ).values_list('pk', 'pub_date'))
+        self.bulk_create(
+            (
+                FeedEntry(user_id=user_id, recipe_id=pk, pub_date=pub_date)
+                for user_id in user_ids
+                for pk, pub_date in recipes
+            ),
+            batch_size=settings.FEED_BATCH_SIZE,
+            ignore_conflicts=True,
+        )
+
+    def page(self, user, limit, before=None):
+        """
+        Up to limit (pub_date, recipe id) keys of the user's feed
+        older than the before key, newest first.
+        Fanned out entries are merged with the recipes of followed
+        authors that were not fanned out,
+        at most limit rows are read from each
+        """
+        entries = self.filter(user=user)
+        recipes = Recipe.objects.filter(
+            author__in=User.objects.filter(subscribed__user=user),
+            fanned_out=False,
+        )
+        if before is not None:
+            pub_date, recipe_id = before
+            entries = entries.filter(
+                models.Q(pub_date__lt=pub_date)
+                | models.Q(pub_date=pub_date, recipe_id__lt=recipe_id)
+            )
+            recipes = recipes.filter(
+                models.Q(pub_date__lt=pub_date)
+                | models.Q(pub_date=pub_date, pk__lt=recipe_id)
+            )
+        keys = {
+            *entries.order_by('-pub_date', '-recipe_id').values_list(
+                'pub_date', 'recipe_id'
+            )[:limit],
+            *recipes.order_by('-pub_date', '-pk').values_list(
+                'pub_date', 'pk'
+            )[:limit],
+        }
+        return sorted(keys, reverse=True)[:limit]
+
+
+class FeedEntry(models.Model):
+    """
+    Recipe of a followed author in the user's feed,
+    written when the recipe is published
+    """
+    user = models.ForeignKey(
+        User,
+        verbose_name=_('user'),
+        related_name='feed_entries',
+        on_delete=models.CASCADE,
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        verbose_name=_('recipe'),
+        related_name='feed_entries',
+        on_delete=models.CASCADE,
+    )
+    # copy of recipe.pub_date, the feed is read in its order
+    pub_date = models.DateTimeField(_('publication date'))
+
+    objects = FeedEntryQuerySet.as_manager()
+
+    class Meta:
+        ordering = ['-pub_date', '-recipe']
+        verbose_name = _('feed entry')
+        verbose_name_plural = _('feed entries')
+        constraints = [models.UniqueConstraint(
+            fields=['user', 'recipe'],
+            name='unique_feed_entry'
+        )]
+        indexes = [models.Index(
+            fields=['user', '-pub_date', '-recipe'],
+            name='feed_user_pub_date_idx'
+        )]
+
+    def __str__(self):
+        return f'{self.recipe.name} in {self.user.get_username()} feed'
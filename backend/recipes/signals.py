@@ -0,0 +1,124 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core.cache import bump_catalogue_version, bump_shopping_cart_version
+from core.counters import change_counters
+from users.models import Subscription, subscriptions_changed
+from .models import (
+    Favorite, FeedEntry, Ingredient, Recipe, RecipeIngredient,
+    ShoppingCart, Tag, User, user_recipes_changed
+)
+
+# counter column of the model each user recipe list is counted in
+USER_RECIPE_COUNTERS = {
+    Favorite: 'favorites_count',
+    ShoppingCart: 'carts_count',
+}
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+def user_recipe_created(sender, instance, created, **kwargs):
+    if created:
+        user_recipes_changed.send(
+            sender=sender,
+            user_id=instance.user_id,
+            deltas={instance.recipe_id: 1},
+        )
+
+
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=ShoppingCart)
+def user_recipe_deleted(sender, instance, **kwargs):
+    user_recipes_changed.send(
+        sender=sender,
+        user_id=instance.user_id,
+        deltas={instance.recipe_id: -1},
+    )
+
+
+@receiver(user_recipes_changed)
+def count_user_recipes(sender, deltas, **kwargs):
+    change_counters(Recipe, USER_RECIPE_COUNTERS[sender], deltas)
+
+
+@receiver(user_recipes_changed, sender=ShoppingCart)
+def shopping_cart_recipes_changed(sender, user_id, **kwargs):
+    bump_shopping_cart_version([user_id])
+
+
+@receiver(post_save, sender=ShoppingCart)
+def shopping_cart_changed(sender, instance, created, **kwargs):
+    """
+    Rows edited in place, added ones are handled above
+    """
+    if not created:
+        bump_shopping_cart_version([instance.user_id])
+
+
+def bump_recipe_shopping_carts(recipe_id):
+    bump_shopping_cart_version(
+        ShoppingCart.objects.filter(
+            recipe_id=recipe_id
+        ).values_list('user_id', flat=True)
+    )
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_changed(sender, instance, created, update_fields, **kwargs):
+    """
+    New recipes are counted for the author. A full save stands for
+    ingredients changed without signals, partial saves bump
+    the shopping carts themselves
+    """
+    if created:
+        change_counters(User, 'recipes_count', {instance.author_id: 1})
+        FeedEntry.objects.fan_out(instance)
+    elif update_fields is None:
+        bump_recipe_shopping_carts(instance.pk)
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(sender, instance, **kwargs):
+    change_counters(User, 'recipes_count', {instance.author_id: -1})
+    Recipe.release_images((
+        instance.image.name,
+        instance.image_thumbnail.name,
+        instance.image_webp.name,
+    ))
+
+
+@receiver(subscriptions_changed, sender=Subscription)
+def subscription_feed_changed(sender, user_id, author_ids, delta, **kwargs):
+    if delta > 0:
+        FeedEntry.objects.backfill([user_id], author_ids)
+    else:
+        FeedEntry.objects.filter(
+            user_id=user_id, recipe__author_id__in=author_ids
+        ).delete()
+
+
+@receiver((post_save, post_delete), sender=RecipeIngredient)
+def recipe_ingredient_changed(sender, instance, **kwargs):
+    bump_recipe_shopping_carts(instance.recipe_id)
+
+
+@receiver(post_save, sender=Ingredient)
+def ingredient_changed(sender, instance, created, **kwargs):
+    if created:
+        return
+    bump_shopping_cart_version(
+        ShoppingCart.objects.filter(
+            recipe__recipe_ingredient__ingredient=instance
+        ).values_list('user_id', flat=True)
+    )
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def ingredients_catalogue_changed(sender, **kwargs):
+    bump_catalogue_version('ingredients')
+
+
+@receiver((post_save, post_delete), sender=Tag)
+def tags_catalogue_changed(sender, **kwargs):
+    bump_catalogue_version('tags')
@@ -10,6 +10,9 @@ admin.site.unregister(Group)
 
 @admin.register(CustomUser)
 class CustomUserAdmin(UserAdmin):
+    list_display = UserAdmin.list_display + (
+        'recipes_count', 'subscribers_count'
+    )
     list_filter = ('email', 'username')
 
 
@@ -1,16 +1,61 @@
-from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.contrib.auth.models import AbstractUser, UserManager
+from django.db import models, transaction
+from django.dispatch import Signal
 from django.utils.translation import gettext_lazy as _
 
+from core.sql import delete_links, insert_links
+
+# sent with the subscriptions written in SQL
+# by SubscriptionQuerySet, which sends no model signals
+subscriptions_changed = Signal()
+
+
+class CustomUserQuerySet(models.QuerySet):
+    """
+    Custom user queryset.
+    """
+
+    def with_subscription_flag(self, user):
+        """
+        Annotate is_subscribed: whether user follows each row
+        """
+        if not user.is_authenticated:
+            return self.annotate(is_subscribed=models.Value(False))
+        return self.annotate(
+            is_subscribed=models.Exists(Subscription.objects.filter(
+                user=user, author=models.OuterRef('pk')
+            ))
+        )
+
+
+class CustomUserManager(UserManager.from_queryset(CustomUserQuerySet)):
+    """
+    Custom user manager.
+    """
+
 
 class CustomUser(AbstractUser):
     """
     Custom user model.
     """
     email = models.EmailField(_('email address'), unique=True)
+    # maintained by recipes.signals and users.signals,
+    # repaired by the recount command
+    recipes_count = models.PositiveIntegerField(
+        _('recipes'),
+        default=0,
+        editable=False,
+    )
+    subscribers_count = models.PositiveIntegerField(
+        _('subscribers'),
+        default=0,
+        editable=False,
+    )
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'first_name', 'last_name']
 
+    objects = CustomUserManager()
+
     class Meta:
         verbose_name = _('user')
         verbose_name_plural = _('users')
@@ -26,6 +71,55 @@ class CustomUser(AbstractUser):
         return self.username
 
 
+class SubscriptionQuerySet(models.QuerySet):
+    """
+    Subscription queryset.
+    """
+
+    def add(self, user, author_ids, fields=None):
+        """
+        Subscribe the user to the existing authors among author_ids
+        with one statement, skipping the user and present subscriptions.
+        Returns the ids of the new authors,
+        or the authors with the given fields loaded
+        """
+        with transaction.atomic(using=self.db):
+            added = insert_links(
+                self.model, 'user', user.pk, 'author',
+                [pk for pk in author_ids if pk != user.pk],
+                returning=fields,
+            )
+            if added:
+                subscriptions_changed.send(
+                    sender=self.model,
+                    user_id=user.pk,
+                    author_ids=(
+                        added if fields is None
+                        else [author.pk for author in added]
+                    ),
+                    delta=1,
+                )
+            return added
+
+    def remove(self, user, author_ids):
+        """
+        Unsubscribe the user from the authors with one statement.
+        Returns the ids of the removed authors
+        """
+        with transaction.atomic(using=self.db):
+            removed = delete_links(
+                self.model, 'user', user.pk, 'author', author_ids
+            )
+            if removed:
+                subscriptions_changed.send(
+                    sender=self.model,
+                    user_id=user.pk,
+                    author_ids=removed,
+                    delta=-1,
+                )
+            return removed
+
+
 class Subscription(models.Model):
     """
     Subscription model.
@@ -44,6 +138,8 @@ class Subscription(models.Model):
         on_delete=models.CASCADE
     )
 
+    objects = SubscriptionQuerySet.as_manager()
+
     class Meta:
         ordering = ['author']
         verbose_name = _('subscription')
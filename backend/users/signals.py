@@ -0,0 +1,33 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core.counters import change_counters
+from .models import CustomUser, Subscription, subscriptions_changed
+
+
+@receiver(post_save, sender=Subscription)
+def subscription_created(sender, instance, created, **kwargs):
+    if created:
+        subscriptions_changed.send(
+            sender=sender,
+            user_id=instance.user_id,
+            author_ids=[instance.author_id],
+            delta=1,
+        )
+
+
+@receiver(post_delete, sender=Subscription)
+def subscription_deleted(sender, instance, **kwargs):
+    subscriptions_changed.send(
+        sender=sender,
+        user_id=instance.user_id,
+        author_ids=[instance.author_id],
+        delta=-1,
+    )
+
+
+@receiver(subscriptions_changed, sender=Subscription)
+def count_subscribers(sender, author_ids, delta, **kwargs):
+    change_counters(
+        CustomUser, 'subscribers_count', dict.fromkeys(author_ids, delta)
+    )
@@ -1,3 +1,9 @@
+// a queued shopping list is polled with a growing delay,
+// about four minutes in total before giving up
+const DOWNLOAD_POLL_ATTEMPTS = 20
+const DOWNLOAD_POLL_DELAY = 1000
+const DOWNLOAD_POLL_MAX_DELAY = 15000
+
 class Api {
   constructor (url, headers) {
     this._url = url
@@ -25,9 +31,10 @@ class Api {
           document.body.appendChild(a); // we need to append the element to the dom -> otherwise it will not work in firefox
           a.click();    
           a.remove();  //afterwards we remove the element again 
+          resolve()
         })
       }
-      reject()
+      reject({ errors: 'Не удалось скачать список покупок' })
     })
   }
 
@@ -385,10 +392,10 @@ class Api {
     ).then(this.checkResponse)
   }
 
-  downloadFile () {
+  downloadFile (url = `/api/recipes/download_shopping_cart/`, attempt = 0) {
     const token = localStorage.getItem('token')
     return fetch(
-      `/api/recipes/download_shopping_cart/`,
+      url,
       {
         method: 'GET',
         headers: {
@@ -396,7 +403,23 @@ class Api {
           'authorization': `Token ${token}`
         }
       }
-    ).then(this.checkFileDownloadResponse)
+    ).then(res => {
+      if (res.status === 202) {
+        // large carts are rendered in the background, poll the export
+        if (attempt >= DOWNLOAD_POLL_ATTEMPTS) {
+          return Promise.reject({
+            errors: 'Список покупок ещё готовится, попробуйте скачать его позже'
+          })
+        }
+        const location = res.headers.get('Location')
+        const delay = Math.min(
+          DOWNLOAD_POLL_DELAY * 1.5 ** attempt, DOWNLOAD_POLL_MAX_DELAY
+        )
+        return new Promise(resolve => setTimeout(resolve, delay))
+          .then(() => this.downloadFile(location, attempt + 1))
+      }
+      return this.checkFileDownloadResponse(res)
+    })
   }
 }
 
@@ -30,7 +30,14 @@ const Cart = ({ updateOrders, orders }) => {
   }, [])
 
   const downloadDocument = () => {
-    api.downloadFile()
+    api
+      .downloadFile()
+      .catch(err => {
+        const { errors } = err
+        if (errors) {
+          alert(errors)
+        }
+      })
   }
 
   return <Main>